@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+from typing import AsyncIterator, Optional
+
+from api.context import count_tokens
+
+class LLMBackend:
+    """Interface between the server and the language model"""
+
+    model_name = "unknown"
+
+    async def generate(self, prompt: str, response_schema: Optional[dict] = None) -> str:
+        """Complete prompt; with response_schema, the reply is JSON matching it"""
+        raise NotImplementedError
+
+    def stream(self, prompt: str, response_schema: Optional[dict] = None) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def count_tokens(self, text: str) -> int:
+        # Local estimate: a remote count would cost a network round trip per request
+        return count_tokens(text)
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the google-generativeai SDK"""
+
+    def __init__(self, model_name: str, api_key: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name=model_name)
+
+    @staticmethod
+    def _generation_config(response_schema: Optional[dict]) -> Optional[dict]:
+        if response_schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": response_schema}
+
+    async def generate(self, prompt: str, response_schema: Optional[dict] = None) -> str:
+        response = await self.model.generate_content_async(
+            prompt, generation_config=self._generation_config(response_schema)
+        )
+        return response.text
+
+    async def stream(self, prompt: str, response_schema: Optional[dict] = None):
+        response = await self.model.generate_content_async(
+            prompt, stream=True, generation_config=self._generation_config(response_schema)
+        )
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. finish/safety metadata)
+                continue
+            if text:
+                yield text
+
+class FakeBackendError(Exception):
+    """Simulated upstream failure; code 429 looks like a Gemini quota error to the rate limiter, others are final"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+# CLIPPY_FAKE_ERROR_KIND -> (code, message) of the simulated failures
+FAKE_ERRORS = {
+    "quota": (429, "429 RESOURCE_EXHAUSTED (simulated by the fake backend)"),
+    "server": (500, "500 INTERNAL (simulated by the fake backend)"),
+    "invalid": (400, "400 INVALID_ARGUMENT (simulated by the fake backend)"),
+}
+
+class FakeBackend(LLMBackend):
+    """Deterministic offline backend with configurable latency, throughput and error rate"""
+
+    model_name = "fake"
+
+    def __init__(self, latency_ms: float = 800.0, latency_distribution: str = "lognormal",
+                 tokens_per_second: float = 80.0, output_tokens: int = 400,
+                 error_rate: float = 0.0, error_kind: str = "quota", seed: int = 0):
+        if error_kind not in FAKE_ERRORS:
+            raise ValueError(f"Unknown fake error kind: {error_kind}")
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.error_kind = error_kind
+        self.rng = random.Random(seed)
+
+    def first_token_delay(self) -> float:
+        """Sample the time to first token, in seconds"""
+        mean = self.latency_ms / 1000.0
+        if self.latency_distribution == "constant":
+            return mean
+        if self.latency_distribution == "uniform":
+            return self.rng.uniform(0, 2 * mean)
+        if self.latency_distribution == "exponential":
+            return self.rng.expovariate(1 / mean) if mean > 0 else 0.0
+        if self.latency_distribution == "lognormal":
+            # sigma 0.5 gives a realistic long tail around the configured mean
+            sigma = 0.5
+            return self.rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma) if mean > 0 else 0.0
+        raise ValueError(f"Unknown latency distribution: {self.latency_distribution}")
+
+    def response_for(self, prompt: str) -> str:
+        """Same prompt, same response, shaped like a PART 1 / PART 2 answer"""
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        half = max(1, self.output_tokens // 2)
+        words = [seed[i % 58:i % 58 + 6] for i in range(half)]
+        explanation = " ".join(words[: half - 4])
+        solution = "```python\n" + "\n".join(f"x_{word} = {i}" for i, word in enumerate(words[:half // 4])) + "\n```"
+        # Echo the section headings the prompt asked for, like the real model does
+        headings = re.findall(r"PART [12] - [A-Z -]+:", prompt)
+        first, second = headings[:2] if len(headings) >= 2 else ("PART 1 - EXPLANATION:", "PART 2 - SOLUTION:")
+        return f"{first}\n{explanation}\n\n{second}\n{solution}"
+
+    def json_response_for(self, prompt: str) -> str:
+        """Same content as response_for, shaped like api.structured.ANALYSIS_SCHEMA"""
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        half = max(1, self.output_tokens // 2)
+        words = [seed[i % 58:i % 58 + 6] for i in range(half)]
+        return json.dumps({
+            "explanation": " ".join(words[: half - 4]),
+            "solution": [{"language": "python", "code": "\n".join(f"x_{word} = {i}" for i, word in enumerate(words[:half // 4]))}],
+            "complexity": {"time": "O(n)", "space": "O(1)"},
+            "line_notes": [{"line": f"x_{words[0]} = 0", "note": "Initializes the first value."}],
+        })
+
+    async def _start(self) -> None:
+        await asyncio.sleep(self.first_token_delay())
+        if self.rng.random() < self.error_rate:
+            raise FakeBackendError(*FAKE_ERRORS[self.error_kind])
+
+    async def generate(self, prompt: str, response_schema: Optional[dict] = None) -> str:
+        await self._start()
+        text = self.json_response_for(prompt) if response_schema else self.response_for(prompt)
+        await asyncio.sleep(self.count_tokens(text) / self.tokens_per_second)
+        return text
+
+    async def stream(self, prompt: str, response_schema: Optional[dict] = None):
+        await self._start()
+        text = self.json_response_for(prompt) if response_schema else self.response_for(prompt)
+        # Emit roughly 20-token chunks at the configured throughput
+        words = text.split(" ")
+        for i in range(0, len(words), 20):
+            piece = " ".join(words[i:i + 20]) + (" " if i + 20 < len(words) else "")
+            await asyncio.sleep(self.count_tokens(piece) / self.tokens_per_second)
+            yield piece
+
+def create_backend(name: str, model_name: str) -> LLMBackend:
+    """Build the backend selected by CLIPPY_LLM_BACKEND"""
+    if name == "gemini":
+        return GeminiBackend(model_name, os.getenv("GEMINI_API_KEY"))
+    if name == "fake":
+        return FakeBackend(
+            latency_ms=float(os.getenv("CLIPPY_FAKE_LATENCY_MS", "800")),
+            latency_distribution=os.getenv("CLIPPY_FAKE_LATENCY_DISTRIBUTION", "lognormal"),
+            tokens_per_second=float(os.getenv("CLIPPY_FAKE_TOKENS_PER_SECOND", "80")),
+            output_tokens=int(os.getenv("CLIPPY_FAKE_OUTPUT_TOKENS", "400")),
+            error_rate=float(os.getenv("CLIPPY_FAKE_ERROR_RATE", "0")),
+            error_kind=os.getenv("CLIPPY_FAKE_ERROR_KIND", "quota"),  # quota (retried), server or invalid
+            seed=int(os.getenv("CLIPPY_FAKE_SEED", "0"))
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+def normalize_code(text: str) -> str:
+    """Normalize pasted text so trivially different copies share a cache entry"""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite on disk) cache for analysis responses.
+
+    SQLite is only touched from one background thread, so the event loop never waits on disk:
+    get() awaits the read on a memory miss, and set() queues the write and returns.
+    """
+
+    def __init__(self, path: Optional[str], ttl: float, max_entries: int, max_disk_entries: int,
+                 prune_every: int = 100):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.prune_every = prune_every  # Stores between evictions; the disk may hold this many rows over the cap
+        self.memory = OrderedDict()  # key -> (stored_at, value)
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+        self.db = None
+        self.disk = None
+        self.unpruned = 0  # Stores since the last eviction; disk thread only
+        if path:
+            self.disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clippy-cache")
+            self.disk.submit(self._open, path)
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        """Hash the model name and the full prompt (template + normalized input)"""
+        digest = hashlib.sha256()
+        digest.update(model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self.memory[key]
+
+        if self.disk is not None:
+            row = await asyncio.get_running_loop().run_in_executor(self.disk, self._load, key, now)
+            if row is not None:
+                stored_at, value = row
+                with self.lock:
+                    self._remember(key, stored_at, value)
+                    self.stats["disk_hits"] += 1
+                return value
+
+        with self.lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: dict) -> None:
+        now = time.time()
+        with self.lock:
+            self._remember(key, now, value)
+            self.stats["stores"] += 1
+        if self.disk is not None:
+            self.disk.submit(self._store, key, json.dumps(value), now)
+
+    async def snapshot(self) -> dict:
+        """Return hit/miss counters and current sizes"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self.memory)
+        if self.disk is not None:
+            stats["disk_entries"] = await asyncio.get_running_loop().run_in_executor(self.disk, self._count)
+        return stats
+
+    def close(self) -> None:
+        """Finish queued writes, then close the database"""
+        if self.disk is not None:
+            self.disk.submit(self._close)
+            self.disk.shutdown(wait=True)
+            self.disk = None
+
+    def _remember(self, key: str, stored_at: float, value: dict) -> None:
+        self.memory[key] = (stored_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    # The methods below run on the disk thread
+
+    def _open(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._prune(time.time())
+        except (OSError, sqlite3.Error) as e:
+            # e.g. a read-only profile: keep serving from the memory tier
+            print(f"⚠️ Response cache disabled, can't open {path}: {e}")
+            self.db = None
+
+    def _load(self, key: str, now: float) -> Optional[tuple]:
+        if self.db is None:
+            return None
+        try:
+            row = self.db.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            return row[1], json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"⚠️ Response cache read failed: {e}")
+            return None
+
+    def _store(self, key: str, value: str, now: float) -> None:
+        if self.db is None:
+            return
+        try:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self.unpruned += 1
+            if self.unpruned >= self.prune_every:
+                self._prune(now)
+            self.db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Response cache write failed: {e}")
+
+    def _prune(self, now: float) -> None:
+        # Evict expired rows, then the least recently used ones over the cap
+        self.unpruned = 0
+        self.db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+        count = self._count()
+        if count > self.max_disk_entries:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_disk_entries,)
+            )
+        self.db.commit()
+
+    def _count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.db is not None else 0
+
+    def _close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
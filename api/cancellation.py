@@ -0,0 +1,82 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+class RequestCancelled(Exception):
+    """Raised in a stream whose session was cancelled with POST /cancel/{session_id}"""
+
+class Detach:
+    """Registry entry that stops one consumer of a shared stream; the producer keeps serving the others"""
+
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    def cancel(self):
+        self.queue.put_nowait(RequestCancelled("Request cancelled"))
+
+class CancelRegistry:
+    """Runs upstream streams in their own tasks so they can be stopped by session id"""
+
+    def __init__(self):
+        self.tasks = {}  # session_id -> set of producer tasks (or Detach entries)
+        self.cancelled = {"client": 0, "request": 0}  # Streams stopped early, by who stopped them
+
+    async def stream(self, chunks: AsyncIterator, session_id: Optional[str] = None):
+        """Yield from chunks, produced by a task that cancel(session_id) or a closing consumer stops"""
+        queue = asyncio.Queue()
+        done = object()
+
+        async def produce():
+            try:
+                async for chunk in chunks:
+                    queue.put_nowait(chunk)
+                queue.put_nowait(done)
+            except Exception as e:
+                queue.put_nowait(e)
+
+        def stopped(task):
+            # Also covers a task cancelled before it ever ran
+            if task.cancelled():
+                queue.put_nowait(RequestCancelled("Request cancelled"))
+
+        task = asyncio.ensure_future(produce())
+        task.add_done_callback(stopped)
+        self.register(session_id, task)
+
+        finished = False
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    finished = True
+                    return
+                if isinstance(item, Exception):
+                    finished = True
+                    if isinstance(item, RequestCancelled):
+                        self.cancelled["request"] += 1
+                    raise item
+                yield item
+        finally:
+            if not finished:
+                # Consumer cancelled or closed mid-stream: the client disconnected or aborted
+                self.cancelled["client"] += 1
+            task.cancel()  # Cancelling the producer aborts the upstream call or its wait for quota
+            self.forget(session_id, task)
+
+    def cancel(self, session_id: str) -> int:
+        """Stop every in-flight upstream stream of a session; returns how many were stopped"""
+        tasks = list(self.tasks.get(session_id, ()))
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def register(self, session_id: Optional[str], task) -> None:
+        """Make task (anything with cancel()) stoppable through cancel(session_id)"""
+        if session_id:
+            self.tasks.setdefault(session_id, set()).add(task)
+
+    def forget(self, session_id: Optional[str], task) -> None:
+        tasks = self.tasks.get(session_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self.tasks[session_id]
@@ -0,0 +1,52 @@
+# Keywords that indicate a programming question
+QUESTION_KEYWORDS = (
+    "explain", "how", "what", "why", "solve", "implement", "algorithm",
+    "data structure", "leetcode", "problem", "challenge", "task",
+    "function", "write", "return", "input", "output", "constraints",
+    "example", "given", "find", "determine", "calculate", "optimize",
+    "time complexity", "space complexity", "array", "string", "tree",
+    "graph", "dynamic programming", "greedy", "binary search", "sort",
+    "medium", "hard", "easy", "difficulty", "solution", "approach"
+)
+
+# Question indicators
+QUESTION_INDICATORS = (
+    "?", "given:", "input:", "output:", "example:", "constraint",
+    "note:", "follow up:", "can you", "write a", "implement a",
+    "design a", "create a", "build a"
+)
+
+# Common code patterns (matched case-sensitively)
+CODE_PATTERNS = ("def ", "class ", "import ", "from ", "=", "{", "}", ";", "//", "/*")
+
+def is_programming_question(text):
+    """Detect if the text is a programming question or code snippet."""
+    # Remove "Additional Context:" part for detection
+    cut = text.find("Additional Context:")
+    main_text = text[:cut] if cut != -1 else text
+    text_lower = main_text.lower()
+
+    # Plain substring checks in C beat any regex here; each loop stops as soon as the answer is known
+    for indicator in QUESTION_INDICATORS:
+        if indicator in text_lower:
+            return True
+
+    # Two distinct keywords means a question
+    keyword_count = 0
+    for keyword in QUESTION_KEYWORDS:
+        if keyword in text_lower:
+            keyword_count += 1
+            if keyword_count >= 2:
+                return True
+
+    if keyword_count == 0:
+        return False
+
+    # Single keyword: if it has many code patterns, it's likely code
+    code_pattern_count = 0
+    for pattern in CODE_PATTERNS:
+        if pattern in main_text:
+            code_pattern_count += 1
+            if code_pattern_count >= 3:
+                return False
+    return True
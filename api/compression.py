@@ -0,0 +1,65 @@
+import zlib
+
+from starlette.responses import JSONResponse
+
+class GzipRequestMiddleware:
+    """ASGI middleware that inflates request bodies sent with Content-Encoding: gzip"""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes  # Limit on the inflated body, so a small upload can't expand without bound
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_gzip(scope):
+            await self.app(scope, receive, send)
+            return
+
+        compressed = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            compressed += message.get("body", b"")
+            if len(compressed) > self.max_bytes:
+                await self._reject(413, "Request body too large", scope, receive, send)
+                return
+            if not message.get("more_body", False):
+                break
+
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)  # gzip container
+        try:
+            body = inflater.decompress(bytes(compressed), self.max_bytes + 1)
+        except zlib.error:
+            await self._reject(400, "Invalid gzip request body", scope, receive, send)
+            return
+        if len(body) > self.max_bytes or inflater.unconsumed_tail:
+            await self._reject(413, "Request body too large", scope, receive, send)
+            return
+
+        headers = [
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        scope = {**scope, "headers": headers}
+        sent = False
+
+        async def inflated_receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, inflated_receive, send)
+
+    @staticmethod
+    def _is_gzip(scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"content-encoding":
+                return value.strip().lower() == b"gzip"
+        return False
+
+    @staticmethod
+    async def _reject(status_code: int, message: str, scope, receive, send):
+        await JSONResponse({"detail": message}, status_code=status_code)(scope, receive, send)
@@ -0,0 +1,117 @@
+import asyncio
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Rough local token count: words and individual punctuation marks
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+CONVERSATION_HEADER = """
+You are ClippyAI, an expert coding assistant. You're having an ongoing conversation about code.
+"""
+
+CONVERSATION_INSTRUCTIONS = """
+
+Respond naturally to continue the conversation. If the user is reporting an error:
+1. Analyze the error carefully
+2. Provide a corrected solution with proper formatting
+3. Explain what was wrong and why
+
+If they're asking for improvements or alternatives:
+1. Suggest better approaches
+2. Explain trade-offs
+3. Provide optimized code
+
+If they're asking questions about the code:
+1. Provide clear explanations
+2. Use examples when helpful
+3. Break down complex concepts
+
+Keep your response conversational, helpful, and well-formatted with code blocks when needed.
+"""
+
+SUMMARY_PROMPT = """
+Summarize the conversation below between a user and ClippyAI, a coding assistant.
+Keep the code being discussed (names, signatures, key lines), reported errors, and
+any decisions or fixes agreed on. Write at most {max_words} words.
+
+{previous}Conversation:
+{transcript}
+"""
+
+def format_turn(msg: Dict[str, str]) -> str:
+    return f"\n{msg['role'].title()}: {msg['content']}"
+
+class ContextBuilder:
+    """Packs the most recent turns into a token budget and summarizes older ones in the background"""
+
+    def __init__(self, budget_tokens: int, summarize: Callable[[str], Awaitable[str]],
+                 summary_words: int = 200, max_sessions: int = 1000):
+        self.budget_tokens = budget_tokens
+        self.summarize = summarize
+        self.summary_words = summary_words
+        self.max_sessions = max_sessions
+        self.summaries = OrderedDict()  # session_id -> (number of messages covered, summary text)
+        self.pending = {}    # session_id -> running summary task
+
+    def build(self, session_id: Optional[str], messages: List[Dict[str, str]], user_message: str) -> str:
+        """Build the follow-up prompt within the token budget"""
+        covered, summary = self.summaries.get(session_id, (0, ""))
+        tail = f"\n\nUser: {user_message}" + CONVERSATION_INSTRUCTIONS
+        remaining = self.budget_tokens - count_tokens(CONVERSATION_HEADER + tail + summary)
+
+        # Walk back from the newest turn until the budget is used up
+        recent = []
+        start = len(messages)
+        while start > covered:
+            turn = format_turn(messages[start - 1])
+            cost = count_tokens(turn)
+            if cost > remaining:
+                if not recent and remaining > 0:
+                    # Newest turn alone is too big: keep its beginning
+                    keep = len(turn) * remaining // cost
+                    recent.append(turn[:keep] + "\n[... truncated ...]")
+                    start -= 1
+                break
+            recent.append(turn)
+            remaining -= cost
+            start -= 1
+
+        if start > covered and session_id is not None:
+            self._schedule_summary(session_id, messages[:start])
+
+        parts = [CONVERSATION_HEADER]
+        if summary:
+            parts.append(f"\nSummary of the earlier conversation:\n{summary}\n")
+        parts.append("\nPrevious conversation context:\n")
+        parts.extend(reversed(recent))
+        parts.append(tail)
+        return "".join(parts)
+
+    def _schedule_summary(self, session_id: str, dropped: List[Dict[str, str]]) -> None:
+        if session_id in self.pending:
+            return
+        task = asyncio.get_running_loop().create_task(self._update_summary(session_id, dropped))
+        self.pending[session_id] = task
+
+    async def _update_summary(self, session_id: str, dropped: List[Dict[str, str]]) -> None:
+        """Fold the turns that no longer fit into the session's rolling summary"""
+        try:
+            covered, summary = self.summaries.get(session_id, (0, ""))
+            previous = f"Summary so far:\n{summary}\n\n" if summary else ""
+            transcript = "".join(format_turn(msg) for msg in dropped[covered:])
+            prompt = SUMMARY_PROMPT.format(
+                max_words=self.summary_words, previous=previous, transcript=transcript
+            )
+            new_summary = await self.summarize(prompt)
+            self.summaries[session_id] = (len(dropped), new_summary.strip())
+            self.summaries.move_to_end(session_id)
+            while len(self.summaries) > self.max_sessions:
+                self.summaries.popitem(last=False)
+        except Exception as e:
+            print(f"⚠️ Failed to summarize conversation {session_id}: {e}")
+        finally:
+            del self.pending[session_id]
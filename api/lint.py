@@ -0,0 +1,244 @@
+# Instant local checks on pasted Python: syntax errors, undefined names and slow patterns.
+# Stdlib only, so the server's worker process starts fast (see run_local_checks in api/server.py).
+import ast
+import builtins
+import re
+import symtable
+import typing
+from typing import Dict, List, Optional
+
+from api.classifier import is_programming_question
+
+# Lines that only read as Python; used to tell a broken Python paste from other languages or prose
+_PYTHON_LINE = re.compile(r"^\s*(?:(?:async\s+)?def \w+\s*\(.*|class \w+.*:|(?:el)?if .+:|else:|try:|except\b.*:|finally:|"
+                          r"(?:async\s+)?(?:for|with) .+:|while .+:|import [\w.]+.*|from [\w.]+ import .+)\s*(?:#.*)?$")
+_C_LIKE_LINE = re.compile(r"[;{}]\s*$")
+# Other statements: assignments, calls, keywords, comments, decorators, closing brackets
+_CODE_LINE = re.compile(r"^\s*(?:[#@)\]}]|[\w.]+(?:\s*,\s*[\w.]+)*\s*(?:[-+*/%&|^]?=(?!=)|\(|\[)|"
+                        r"(?:return|raise|pass|break|continue|yield|assert|del|global|nonlocal)\b)")
+# A def or class header ending the paste, like the stub under a LeetCode problem statement
+_TRAILING_HEADER = re.compile(r"^([ \t]*)(?:async\s+)?(?:def|class)\b.*:\s*(?:#.*)?$")
+
+# Names a snippet may use without defining them: builtins, module dunders, and what LeetCode's editor predefines
+_PREDEFINED = (
+    set(dir(builtins))
+    | {"__name__", "__file__", "__doc__", "__spec__", "__loader__", "__package__", "__builtins__", "__annotations__"}
+    | set(typing.__all__)
+    | {"ListNode", "TreeNode", "Node"}
+)
+
+# Methods that change a container, so len() of it in a while condition is not loop-invariant
+_MUTATORS = {"append", "extend", "insert", "pop", "popleft", "appendleft", "remove", "clear", "add", "discard",
+             "update", "setdefault", "popitem", "push", "heappush", "heappop"}
+
+# Findings kept per kind; a big paste can have thousands, and each one is sent, rendered and put in the prompt
+MAX_FINDINGS_PER_KIND = 20
+
+def finding(line: Optional[int], kind: str, message: str) -> Dict:
+    return {"line": line, "kind": kind, "message": message}
+
+def looks_like_python(code: str) -> bool:
+    lines = [line for line in code.split("\n") if line.strip()]
+    python = sum(1 for line in lines if _PYTHON_LINE.match(line))
+    c_like = sum(1 for line in lines if _C_LIKE_LINE.search(line))
+    return python > c_like
+
+def is_code_line(line: str) -> bool:
+    return (line[:1].isspace() or bool(_PYTHON_LINE.match(line) or _C_LIKE_LINE.search(line) or _CODE_LINE.match(line)))
+
+def reads_like_problem(code: str) -> bool:
+    """A problem statement with code in it: mostly prose, or a programming question with some prose lines"""
+    lines = [line for line in code.split("\n") if line.strip()]
+    prose = sum(1 for line in lines if not is_code_line(line))
+    return prose * 2 > len(lines) or (prose > 0 and is_programming_question(code))
+
+def complete_stub(code: str) -> str:
+    """Give a trailing def/class header with no body a `pass`, so a pasted stub parses"""
+    lines = code.rstrip().split("\n")
+    header = _TRAILING_HEADER.match(lines[-1])
+    if header is None:
+        return code
+    return "\n".join(lines + [header.group(1) + "    pass"])
+
+def check_code(code: str) -> List[Dict]:
+    """Findings for a paste, sorted by line; [] if it isn't Python"""
+    code = complete_stub(code)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        # Problem statements don't parse as a whole; that's not an error to report
+        if not looks_like_python(code) or reads_like_problem(code):
+            return []
+        return [finding(e.lineno, "syntax", f"SyntaxError: {e.msg}")]
+    except (ValueError, RecursionError):
+        return []
+
+    # Something like a sentence or a lone word parses too; require a statement that does something
+    if not any(not isinstance(node, ast.Expr) or isinstance(node.value, ast.Call) for node in tree.body):
+        return []
+
+    findings = undefined_names(code, tree) + PerformanceChecks().run(tree)
+    return cap_findings(sorted(findings, key=lambda f: (f["line"] or 0, f["kind"])))
+
+def cap_findings(findings: List[Dict], per_kind: int = MAX_FINDINGS_PER_KIND) -> List[Dict]:
+    """The first per_kind findings of each kind, then one "N more" finding per kind that had too many"""
+    kept, counts = [], {}
+    for item in findings:
+        counts[item["kind"]] = counts.get(item["kind"], 0) + 1
+        if counts[item["kind"]] <= per_kind:
+            kept.append(item)
+    return kept + [
+        finding(None, kind, f"{count - per_kind} more {kind} findings not shown")
+        for kind, count in counts.items() if count > per_kind
+    ]
+
+def undefined_names(code: str, tree: ast.Module) -> List[Dict]:
+    """Global names read somewhere but never bound at module level"""
+    try:
+        module = symtable.symtable(code, "<paste>", "exec")
+    except (SyntaxError, ValueError, RecursionError):
+        return []
+    if any(isinstance(node, ast.ImportFrom) and any(alias.name == "*" for alias in node.names) for node in ast.walk(tree)):
+        return []  # A star import can bind anything
+
+    defined, used = set(), set()
+
+    def visit(table, is_module):
+        for symbol in table.get_symbols():
+            name = symbol.get_name()
+            if (is_module or symbol.is_declared_global()) and (symbol.is_assigned() or symbol.is_imported()
+                                                               or symbol.is_namespace()):
+                defined.add(name)
+            if symbol.is_referenced() and (is_module or symbol.is_global()):
+                used.add(name)
+        for child in table.get_children():
+            visit(child, False)
+
+    visit(module, True)
+    missing = used - defined - _PREDEFINED
+    if not missing:
+        return []
+
+    first_use = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in missing and isinstance(node.ctx, ast.Load):
+            first_use[node.id] = min(first_use.get(node.id, node.lineno), node.lineno)
+    return [
+        finding(first_use.get(name), "undefined-name", f"`{name}` is used but never defined or imported")
+        for name in sorted(missing)
+    ]
+
+class PerformanceChecks(ast.NodeVisitor):
+    """Common slow patterns: string += in loops, list membership in loops, invariant len() in while"""
+
+    def __init__(self):
+        self.findings = []
+        self.loop_depth = 0
+        self.strings = set()  # Names assigned a string literal
+        self.lists = set()  # Names assigned a list
+
+    def run(self, tree: ast.AST) -> List[Dict]:
+        # Collect assignments first, so a loop above its variable's definition (in file order) is still checked
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        self._classify(target.id, node.value)
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value is not None:
+                self._classify(node.target.id, node.value)
+        self.visit(tree)
+        return self.findings
+
+    def _classify(self, name: str, value: ast.AST):
+        if isinstance(value, ast.JoinedStr) or (isinstance(value, ast.Constant) and isinstance(value.value, str)):
+            self.strings.add(name)
+        elif isinstance(value, (ast.List, ast.ListComp)) or (
+                isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id == "list"):
+            self.lists.add(name)
+
+    def _loop(self, node):
+        self.loop_depth += 1
+        self.generic_visit(node)
+        self.loop_depth -= 1
+
+    def visit_For(self, node):
+        self.visit(node.iter)  # The iterable is evaluated once, outside the loop
+        self.loop_depth += 1
+        for child in [node.target] + node.body + node.orelse:
+            self.visit(child)
+        self.loop_depth -= 1
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        for call in ast.walk(node.test):
+            if (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == "len"
+                    and len(call.args) == 1 and isinstance(call.args[0], ast.Name)
+                    and not self._mutated(call.args[0].id, node.body)):
+                self.findings.append(finding(
+                    node.lineno, "performance",
+                    f"`len({call.args[0].id})` is re-evaluated on every iteration but `{call.args[0].id}` "
+                    "doesn't change in the loop; compute it once before the loop"
+                ))
+        self._loop(node)
+
+    def visit_ListComp(self, node):
+        self._loop(node)
+
+    visit_SetComp = visit_DictComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_AugAssign(self, node):
+        if self.loop_depth and isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name):
+            value = node.value
+            is_string = isinstance(value, ast.JoinedStr) or (isinstance(value, ast.Constant) and isinstance(value.value, str))
+            if is_string or node.target.id in self.strings:
+                self.findings.append(finding(
+                    node.lineno, "performance",
+                    f"String `{node.target.id}` is built with += in a loop, copying it each time; "
+                    "collect the parts in a list and ''.join() them"
+                ))
+        self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        if self.loop_depth:
+            for op, right in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and isinstance(right, ast.Name) and right.id in self.lists:
+                    self.findings.append(finding(
+                        node.lineno, "performance",
+                        f"Membership test on list `{right.id}` inside a loop scans the list each time; "
+                        "use a set for O(1) lookups"
+                    ))
+        self.generic_visit(node)
+
+    @staticmethod
+    def _mutated(name: str, body: List[ast.stmt]) -> bool:
+        for statement in body:
+            for node in ast.walk(statement):
+                if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                    if isinstance(node.func.value, ast.Name) and node.func.value.id == name and node.func.attr in _MUTATORS:
+                        return True
+                    if node.func.attr in _MUTATORS and any(isinstance(a, ast.Name) and a.id == name for a in node.args):
+                        return True  # e.g. heapq.heappush(name, x)
+                elif isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Delete)):
+                    targets = node.targets if isinstance(node, (ast.Assign, ast.Delete)) else [node.target]
+                    for target in targets:
+                        for inner in ast.walk(target):
+                            if isinstance(inner, ast.Name) and inner.id == name:
+                                return True
+        return False
+
+def format_findings(findings: List[Dict]) -> str:
+    """Markdown for the fixes pane"""
+    lines = ["### ⚡ Local checks"]
+    for item in findings:
+        where = f"Line {item['line']}" if item["line"] else "Code"
+        lines.append(f"- **{where}** ({item['kind']}): {item['message']}")
+    return "\n".join(lines)
+
+def format_findings_prompt(findings: List[Dict]) -> str:
+    """Appended to the analysis prompt so the model builds on the findings instead of rediscovering them"""
+    lines = ["", "        Automated local checks already found these issues; confirm and explain them, and fix them in your answer:"]
+    for item in findings:
+        where = f"line {item['line']}" if item["line"] else "code"
+        lines.append(f"        - {where} ({item['kind']}): {item['message']}")
+    return "\n".join(lines) + "\n"
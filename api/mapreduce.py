@@ -0,0 +1,121 @@
+import ast
+import re
+from typing import List, NamedTuple
+
+# Start of a definition in common languages, for code that doesn't parse as Python
+_DEFINITION = re.compile(
+    r"(?:(?:export|public|private|protected|internal|static|async|pub|abstract|final)\s+)*"
+    r"(?:def|class|function|func|fn|fun|interface|struct|impl|enum|trait|module|namespace)\b"
+)
+
+class Chunk(NamedTuple):
+    start: int  # First line, 1-based
+    end: int  # Last line, inclusive
+    text: str
+
+def _python_boundaries(tree: ast.Module, lines: List[str], max_chars: int) -> List[int]:
+    """0-based lines where top-level statements start, descending into classes too big for one chunk"""
+    boundaries = []
+    for node in tree.body:
+        # Decorators belong to the definition below them
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+        boundaries.append(start)
+        end = getattr(node, "end_lineno", None) or start + 1
+        if isinstance(node, ast.ClassDef) and len("\n".join(lines[start:end])) > max_chars:
+            for child in node.body[1:]:
+                boundaries.append(min([child.lineno] + [d.lineno for d in getattr(child, "decorator_list", [])]) - 1)
+    return boundaries
+
+def _heuristic_boundaries(lines: List[str]) -> List[int]:
+    """Definitions, and unindented lines after a blank line (a new top-level block in most languages)"""
+    boundaries = []
+    for i, line in enumerate(lines):
+        stripped = line.lstrip()
+        if not stripped:
+            continue
+        if _DEFINITION.match(stripped) or (line == stripped and i > 0 and not lines[i - 1].strip()):
+            boundaries.append(i)
+    return boundaries
+
+def split_code(code: str, max_chars: int) -> List[Chunk]:
+    """Split code into chunks of at most max_chars at function/class boundaries where possible"""
+    lines = code.split("\n")
+    try:
+        boundaries = _python_boundaries(ast.parse(code), lines, max_chars)
+    except (SyntaxError, ValueError, RecursionError):
+        boundaries = _heuristic_boundaries(lines)
+    boundaries = sorted(set([0] + [b for b in boundaries if 0 < b < len(lines)]))
+
+    # Blocks between boundaries, hard-split by lines if one alone is too big
+    blocks = []
+    for start, end in zip(boundaries, boundaries[1:] + [len(lines)]):
+        size = 0
+        for i in range(start, end):
+            if size and size + len(lines[i]) + 1 > max_chars:
+                blocks.append((start, i))
+                start, size = i, 0
+            size += len(lines[i]) + 1
+        blocks.append((start, end))
+
+    # Pack neighbouring blocks into chunks
+    chunks = []
+    chunk_start, size = blocks[0][0], 0
+    for start, end in blocks:
+        block_size = sum(len(line) + 1 for line in lines[start:end])
+        if size and size + block_size > max_chars:
+            chunks.append(Chunk(chunk_start + 1, start, "\n".join(lines[chunk_start:start])))
+            chunk_start, size = start, 0
+        size += block_size
+    chunks.append(Chunk(chunk_start + 1, len(lines), "\n".join(lines[chunk_start:])))
+    return chunks
+
+def format_chunk_prompt(chunk: Chunk, index: int, total: int) -> str:
+    """Map step: review one chunk on its own"""
+    return f"""
+        You are a coding assistant reviewing part {index + 1} of {total} (lines {chunk.start}-{chunk.end}) of a file
+        too large to review at once. Other parts are reviewed separately, so names defined elsewhere are not errors.
+
+        {chunk.text}
+
+        Reply with concise notes only:
+        1. What this part does, in two or three sentences
+        2. Significant lines, each in **bold** followed by a short explanation
+        3. Syntax or logical errors, with the line they are on
+        4. Suggested improvements or optimizations
+        """
+
+def format_reduce_prompt(chunks: List[Chunk], reviews: List[str], json_mode: bool = False) -> str:
+    """Reduce step: merge the per-chunk reviews into one analysis in the usual format"""
+    merged = "\n\n".join(
+        f"### Part {i + 1} (lines {chunk.start}-{chunk.end})\n{review}"
+        for i, (chunk, review) in enumerate(zip(chunks, reviews))
+    )
+    intro = f"""
+        You are a coding assistant. A file too large to analyze in one pass was split into {len(chunks)} parts
+        and each part was reviewed separately. Merge these reviews into one analysis of the whole file:
+
+        {merged}
+        """
+    if json_mode:
+        return intro + """
+        Respond with JSON only:
+        - "explanation": what the file does overall, how its parts fit together and the programming concepts used (markdown)
+        - "line_notes": the significant lines from the reviews with their explanations, keeping every syntax or logical error
+        - "solution": corrected or improved code for the errors and optimizations found, as code blocks, or an empty list
+        - "complexity": the time and space complexity of the file's main operations in big-O notation
+        """
+    return intro + """
+        Provide a comprehensive response with two parts:
+
+        PART 1 - CODE EXPLANATION:
+        1. Explain what the file does overall and how its parts fit together
+        2. Describe the purpose and functionality
+        3. Mention the programming concepts used
+
+        PART 2 - LINE-BY-LINE ANALYSIS:
+        1. Go through the significant lines from the reviews, in file order
+        2. For each, mention the line in **bold** followed by explanation
+        3. Keep every syntax or logical error the reviews found
+        4. Suggest improvements or optimizations, merging ones that apply to several parts
+        5. Point out best practices or potential issues
+        """
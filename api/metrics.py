@@ -0,0 +1,166 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Seconds; covers sub-millisecond CPU stages up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0
+)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels, in Prometheus text format"""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}  # label values -> count
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, in Prometheus text format"""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                pairs = list(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(pairs)} {series[-1]!r}")
+                lines.append(f"{self.name}_count{_format_labels(pairs)} {cumulative}")
+        return lines
+
+class Registry:
+    """Holds the metrics recorded inline and renders them with any counters kept elsewhere"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, extra: List[Tuple[str, str, str, Dict[tuple, float]]] = ()) -> str:
+        """Text exposition format; extra holds (name, type, help, {label pairs: value}) read at scrape time"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for name, kind, help, samples in extra:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for pairs, value in samples.items():
+                lines.append(f"{name}{_format_labels(list(pairs))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# Per-stage timings
+CLASSIFICATION_SECONDS = REGISTRY.register(Histogram(
+    "clippy_classification_seconds", "Time spent in is_programming_question"))
+PROMPT_BUILD_SECONDS = REGISTRY.register(Histogram(
+    "clippy_prompt_build_seconds", "Time spent building prompts", ("kind",)))
+UPSTREAM_SECONDS = REGISTRY.register(Histogram(
+    "clippy_upstream_seconds", "LLM call latency, including streaming the whole response", ("mode",)))
+UPSTREAM_TTFT_SECONDS = REGISTRY.register(Histogram(
+    "clippy_upstream_ttft_seconds", "Time to first token of streamed LLM calls"))
+LOCAL_CHECK_SECONDS = REGISTRY.register(Histogram(
+    "clippy_local_check_seconds", "Local pre-analysis (api/lint.py) time, including the worker process round trip"))
+SPLIT_SECONDS = REGISTRY.register(Histogram(
+    "clippy_response_split_seconds", "Time spent splitting responses into explanation/fixes"))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "clippy_request_seconds", "Total request time, until the last byte is sent", ("route", "status")))
+
+# Counters recorded inline
+ERRORS = REGISTRY.register(Counter(
+    "clippy_errors_total", "Errors returned to clients, by exception type", ("type",)))
+TOKENS = REGISTRY.register(Counter(
+    "clippy_tokens_total", "Estimated LLM tokens, by direction", ("direction",)))
+
+class RequestTimingMiddleware:
+    """ASGI middleware that times each HTTP request until its response body is complete"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Use the route template, not the raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                route=getattr(route, "path", "unmatched"), status=status["code"]
+            )
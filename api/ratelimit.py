@@ -0,0 +1,111 @@
+import asyncio
+import math
+import random
+import time
+from typing import Optional
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be served within the upstream quota"""
+
+    def __init__(self, status_code: int, retry_after: float, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+def is_quota_error(error: Exception) -> bool:
+    """Detect Gemini 429 / RESOURCE_EXHAUSTED errors without depending on a specific SDK class"""
+    if getattr(error, "code", None) == 429:
+        return True
+    text = str(error)
+    return "RESOURCE_EXHAUSTED" in text or "Resource has been exhausted" in text
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute, holding at most burst units"""
+
+    def __init__(self, rate_per_minute: float, burst: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, burst)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available (0 if they are available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        # May go negative when charging actual usage after the fact
+        self._refill()
+        self.level -= amount
+
+class RateLimiter:
+    """Smooths upstream calls to requests/tokens per minute with a bounded FIFO wait queue"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_queue: int,
+                 max_retries: int = 4, base_backoff: float = 1.0, max_backoff: float = 30.0,
+                 burst_seconds: float = 10.0):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute * burst_seconds / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute * burst_seconds / 60.0)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock = asyncio.Lock()  # Waiters are served in arrival order
+        self.waiting = 0
+        self.stats = {
+            "admitted": 0, "rejected": 0, "retries": 0, "quota_errors": 0,
+            "queue_wait_seconds": 0.0, "queue_wait_max_seconds": 0.0
+        }
+
+    def estimated_wait(self) -> float:
+        return (self.waiting + 1) / self.requests.rate
+
+    def check_capacity(self) -> None:
+        """Fail fast when the wait queue is already full"""
+        if self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise RateLimitExceeded(503, self.estimated_wait(), "Server is busy, too many queued requests")
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait for one request slot and the estimated prompt tokens"""
+        self.check_capacity()
+        self.waiting += 1
+        try:
+            async with self.lock:
+                while True:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                self.stats["admitted"] += 1
+        finally:
+            self.waiting -= 1
+
+    def record_wait(self, seconds: float) -> None:
+        """Track time spent queued (rate limit plus concurrency slot) before an upstream call"""
+        self.stats["queue_wait_seconds"] += seconds
+        self.stats["queue_wait_max_seconds"] = max(self.stats["queue_wait_max_seconds"], seconds)
+
+    def charge(self, tokens: int) -> None:
+        """Account for tokens only known after the call (the response)"""
+        self.tokens.take(tokens)
+
+    def backoff(self, error: Exception, attempt: int) -> Optional[float]:
+        """Delay before retrying error, or None if it is not a quota error"""
+        if not is_quota_error(error):
+            return None
+        self.stats["quota_errors"] += 1
+        ceiling = min(self.max_backoff, self.base_backoff * 2 ** attempt)
+        if attempt >= self.max_retries:
+            raise RateLimitExceeded(429, ceiling, "Gemini quota exhausted, please retry later") from error
+        self.stats["retries"] += 1
+        # Full jitter keeps retrying clients from synchronizing
+        return random.uniform(0, ceiling)
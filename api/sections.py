@@ -0,0 +1,101 @@
+from typing import List, Tuple
+
+# Section markers used by the two analysis prompts in server.py
+QUESTION_SECTIONS = {
+    "explanation_header": "PART 1 - EXPLANATION:",
+    "fixes_header": "- SOLUTION:",
+    "fixes_title": "SOLUTION:\n",
+}
+
+SNIPPET_SECTIONS = {
+    "explanation_header": "PART 1 - CODE EXPLANATION:",
+    "fixes_header": "- LINE-BY-LINE ANALYSIS:",
+    "fixes_title": "LINE-BY-LINE ANALYSIS:\n",
+}
+
+class SectionParser:
+    """Routes streamed model output to the explanation or fixes channel as it arrives"""
+
+    def __init__(self, explanation_header: str, fixes_header: str, fixes_title: str,
+                 switch_marker: str = "PART 2"):
+        self.switch_marker = switch_marker
+        self.fixes_title = fixes_title
+        # Markers that are dropped from the text of each channel
+        self.drop_markers = {
+            "explanation": explanation_header,
+            "fixes": fixes_header,
+        }
+        self.channel = "explanation"
+        self.buffer = ""
+        self.parts = {"explanation": [], "fixes": []}
+        self.started = {"explanation": False, "fixes": False}
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """Consume a chunk and return the (channel, text) pieces that are safe to emit"""
+        self.buffer += text
+        events = []
+
+        while True:
+            markers = self._active_markers()
+
+            # Earliest complete marker in the buffer, if any
+            found = None
+            for marker in markers:
+                index = self.buffer.find(marker)
+                if index != -1 and (found is None or index < found[0]):
+                    found = (index, marker)
+
+            if found is not None:
+                index, marker = found
+                self._emit(events, self.buffer[:index])
+                self.buffer = self.buffer[index + len(marker):]
+                if marker == self.switch_marker:
+                    self.channel = "fixes"
+                    self.parts["fixes"].append(self.fixes_title)
+                    events.append(("fixes", self.fixes_title))
+                continue
+
+            # Hold back a tail that could be the start of a marker split across chunks
+            keep = 0
+            for marker in markers:
+                for size in range(min(len(marker) - 1, len(self.buffer)), keep, -1):
+                    if self.buffer.endswith(marker[:size]):
+                        keep = size
+                        break
+
+            self._emit(events, self.buffer[:len(self.buffer) - keep])
+            self.buffer = self.buffer[len(self.buffer) - keep:]
+            return events
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush whatever is still held back at the end of the stream"""
+        events = []
+        self._emit(events, self.buffer)
+        self.buffer = ""
+        return events
+
+    def result(self) -> Tuple[str, str]:
+        """Return the (explanation, fixes) text seen so far"""
+        explanation = "".join(self.parts["explanation"]).strip()
+        fixes = "".join(self.parts["fixes"]).strip()
+        return explanation, fixes
+
+    def _active_markers(self) -> List[str]:
+        if self.channel == "explanation":
+            return [self.switch_marker, self.drop_markers["explanation"]]
+        return [self.drop_markers["fixes"]]
+
+    def _emit(self, events, text: str):
+        # Leading whitespace of each section is dropped, like str.strip() on the full text
+        if not self.started[self.channel]:
+            text = text.lstrip()
+            if not text:
+                return
+            self.started[self.channel] = True
+        if text:
+            self.parts[self.channel].append(text)
+            events.append((self.channel, text))
+
+def new_section_parser(is_question: bool) -> SectionParser:
+    """Create a parser for the question or code-snippet prompt layout"""
+    return SectionParser(**(QUESTION_SECTIONS if is_question else SNIPPET_SECTIONS))
@@ -1,125 +1,284 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import json
+import multiprocessing
 import os
-import google.generativeai as genai
+import time
 from typing import List, Optional, Dict
+from api.classifier import is_programming_question
+from api.sections import new_section_parser
+from api.cache import ResponseCache, normalize_code
+from api.singleflight import SingleFlight
+from api.context import ContextBuilder
+from api.sessions import SessionStore
+from api.ratelimit import RateLimiter, RateLimitExceeded
+from api.backends import create_backend
+from api.structured import ANALYSIS_SCHEMA, StructuredOutputError, format_json_prompt, parse_analysis, render_analysis
+from api.compression import GzipRequestMiddleware
+from api.cancellation import CancelRegistry, Detach, RequestCancelled
+from api.mapreduce import Chunk, format_chunk_prompt, format_reduce_prompt, split_code
+from api import lint, metrics
 
 # ✅ Load environment variables
 load_dotenv()
 
-# ✅ Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+MODEL_NAME = "models/gemini-1.5-flash"
 
-app = FastAPI()
+# "gemini" for the real API, "fake" for the offline backend (see api/backends.py)
+LLM_BACKEND = os.getenv("CLIPPY_LLM_BACKEND", "gemini")
+
+# "sections" asks for PART 1 / PART 2 prose, "json" for schema-constrained JSON (see api/structured.py)
+OUTPUT_MODE = os.getenv("CLIPPY_OUTPUT_MODE", "sections")
+
+# Max number of Gemini calls in flight at once (independent of the anyio threadpool)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("CLIPPY_MAX_CONCURRENT_REQUESTS", "16"))
+
+# Response cache for /analyze (set CLIPPY_CACHE_PATH to an empty string for memory only)
+CACHE_PATH = os.getenv("CLIPPY_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".clippyai", "response_cache.sqlite3"))
+CACHE_TTL_SECONDS = float(os.getenv("CLIPPY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("CLIPPY_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_DISK_ENTRIES = int(os.getenv("CLIPPY_CACHE_MAX_DISK_ENTRIES", "5000"))
+
+# Token budget for chat prompts; older turns are folded into a rolling summary
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CLIPPY_CONTEXT_TOKEN_BUDGET", "8000"))
+
+# Upstream quota: requests/tokens per minute, bounded wait queue, retries on 429
+RATE_LIMIT_RPM = float(os.getenv("CLIPPY_RATE_LIMIT_RPM", "15"))
+RATE_LIMIT_TPM = float(os.getenv("CLIPPY_RATE_LIMIT_TPM", "1000000"))
+RATE_LIMIT_MAX_QUEUE = int(os.getenv("CLIPPY_RATE_LIMIT_MAX_QUEUE", "50"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("CLIPPY_RATE_LIMIT_MAX_RETRIES", "4"))
+
+# Largest request body accepted after gzip decompression
+MAX_REQUEST_BYTES = int(os.getenv("CLIPPY_MAX_REQUEST_BYTES", str(20 * 1024 * 1024)))
+
+# /analyze/batch: max items per request and max items analyzed at once per batch
+BATCH_MAX_ITEMS = int(os.getenv("CLIPPY_BATCH_MAX_ITEMS", "100"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("CLIPPY_BATCH_MAX_CONCURRENCY", "4"))
+
+# Pastes longer than this (in characters) are analyzed in chunks and merged; 0 disables it
+MAP_REDUCE_MIN_CHARS = int(os.getenv("CLIPPY_MAP_REDUCE_MIN_CHARS", "40000"))
+MAP_REDUCE_CHUNK_CHARS = int(os.getenv("CLIPPY_MAP_REDUCE_CHUNK_CHARS", "16000"))
+MAP_REDUCE_MAX_CHUNKS = int(os.getenv("CLIPPY_MAP_REDUCE_MAX_CHUNKS", "24"))  # Chunks grow past CHUNK_CHARS beyond this
+MAP_REDUCE_CONCURRENCY = int(os.getenv("CLIPPY_MAP_REDUCE_CONCURRENCY", "4"))  # Chunks reviewed at once per paste
+
+# Local syntax/undefined-name/anti-pattern checks (api/lint.py) in a worker process, before the LLM call
+LOCAL_CHECKS = os.getenv("CLIPPY_LOCAL_CHECKS", "1") == "1"
+LOCAL_CHECK_TIMEOUT_SECONDS = float(os.getenv("CLIPPY_LOCAL_CHECK_TIMEOUT_SECONDS", "2"))
+LOCAL_CHECK_MAX_CHARS = int(os.getenv("CLIPPY_LOCAL_CHECK_MAX_CHARS", "200000"))  # Bigger pastes take seconds to check
+
+# Server-side chat sessions: total size cap (characters) and idle eviction
+SESSION_MAX_CHARS = int(os.getenv("CLIPPY_SESSION_MAX_CHARS", str(50_000_000)))
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("CLIPPY_SESSION_IDLE_TTL_SECONDS", "3600"))
+
+# Mirrors the system message ConversationManager puts at the start of every session
+SESSION_SYSTEM_MESSAGE = "You are ClippyAI, helping with code analysis and debugging."
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the shared LLM backend and response cache once at startup"""
+    app.state.backend = create_backend(LLM_BACKEND, MODEL_NAME)
+    app.state.llm_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    app.state.cache = ResponseCache(CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_MAX_DISK_ENTRIES)
+    app.state.singleflight = SingleFlight()
+    app.state.context_builder = ContextBuilder(
+        CONTEXT_TOKEN_BUDGET, lambda prompt: generate_text(app.state.backend, prompt)
+    )
+    app.state.sessions = SessionStore(SESSION_MAX_CHARS, SESSION_IDLE_TTL_SECONDS)
+    app.state.rate_limiter = RateLimiter(
+        RATE_LIMIT_RPM, RATE_LIMIT_TPM, RATE_LIMIT_MAX_QUEUE, max_retries=RATE_LIMIT_MAX_RETRIES
+    )
+    app.state.cancellations = CancelRegistry()
+    app.state.lint_pool = None
+    if LOCAL_CHECKS:
+        # spawn, not fork: this process already runs threads (the GUI, the engine loop)
+        app.state.lint_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        app.state.lint_pool.submit(lint.check_code, "")  # Start the worker now, not on the first paste
+    yield
+    if app.state.lint_pool is not None:
+        app.state.lint_pool.shutdown(wait=False, cancel_futures=True)
+    app.state.cache.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(GzipRequestMiddleware, max_bytes=MAX_REQUEST_BYTES)
+app.add_middleware(metrics.RequestTimingMiddleware)  # Outermost, so timings include decompression
 
 class CodeInput(BaseModel):
     code: str
     session_id: Optional[str] = None
     is_followup: bool = False
     conversation_context: Optional[List[Dict[str, str]]] = None
+    seq: Optional[int] = None  # Messages the client has before this one (chat deltas)
 
-def is_programming_question(text):
-    """Detect if the text is a programming question or code snippet."""
-    # Remove "Additional Context:" part for detection
-    main_text = text.split("Additional Context:")[0] if "Additional Context:" in text else text
-    
-    # Keywords that indicate a programming question
-    question_keywords = [
-        "explain", "how", "what", "why", "solve", "implement", "algorithm", 
-        "data structure", "leetcode", "problem", "challenge", "task", 
-        "function", "write", "return", "input", "output", "constraints", 
-        "example", "given", "find", "determine", "calculate", "optimize",
-        "time complexity", "space complexity", "array", "string", "tree",
-        "graph", "dynamic programming", "greedy", "binary search", "sort",
-        "medium", "hard", "easy", "difficulty", "solution", "approach"
-    ]
-    
-    # Question indicators
-    question_indicators = [
-        "?", "given:", "input:", "output:", "example:", "constraint", 
-        "note:", "follow up:", "can you", "write a", "implement a",
-        "design a", "create a", "build a"
-    ]
-    
-    text_lower = main_text.lower()
-    
-    # Check for question marks or indicators
-    for indicator in question_indicators:
-        if indicator in text_lower:
-            return True
-    
-    # Check for question keywords
-    keyword_count = sum(1 for keyword in question_keywords if keyword in text_lower)
-    
-    # If multiple keywords found, likely a question
-    if keyword_count >= 2:
-        return True
-    
-    # Check if it looks like code (has common code patterns)
-    code_patterns = ["def ", "class ", "import ", "from ", "=", "{", "}", ";", "//", "/*"]
-    code_pattern_count = sum(1 for pattern in code_patterns if pattern in main_text)
-    
-    # If has many code patterns and few question keywords, likely code
-    if code_pattern_count >= 3 and keyword_count < 2:
-        return False
-    
-    # Default: if has question keywords, treat as question
-    return keyword_count > 0
+class BatchInput(BaseModel):
+    items: List[CodeInput]
+    max_concurrency: Optional[int] = None  # Capped at CLIPPY_BATCH_MAX_CONCURRENCY
 
-def handle_conversation(model, input: CodeInput):
-    """Handle follow-up conversation with context"""
-    
-    # Build conversation prompt with full context
-    conversation_prompt = """
-You are ClippyAI, an expert coding assistant. You're having an ongoing conversation about code.
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded(request, exc: RateLimitExceeded):
+    metrics.ERRORS.inc(type=type(exc).__name__)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
-Previous conversation context:
-"""
-    
-    for msg in input.conversation_context:
-        conversation_prompt += f"\n{msg['role'].title()}: {msg['content']}"
-    
-    conversation_prompt += f"\n\nUser: {input.code}"
-    conversation_prompt += """
-
-Respond naturally to continue the conversation. If the user is reporting an error:
-1. Analyze the error carefully
-2. Provide a corrected solution with proper formatting
-3. Explain what was wrong and why
-
-If they're asking for improvements or alternatives:
-1. Suggest better approaches
-2. Explain trade-offs
-3. Provide optimized code
-
-If they're asking questions about the code:
-1. Provide clear explanations
-2. Use examples when helpful
-3. Break down complex concepts
-
-Keep your response conversational, helpful, and well-formatted with code blocks when needed.
-"""
-    
-    response = model.generate_content(conversation_prompt)
-    result = response.text.strip()
-    
-    return {
-        "explanation": "",  # Empty for chat mode
-        "fixes": "",       # Empty for chat mode  
-        "chat_response": result,
-        "session_id": input.session_id
-    }
+async def generate_text(backend, prompt: str, response_schema: Optional[dict] = None) -> str:
+    """Run one model call under the rate limiter and the shared concurrency limit"""
+    limiter = app.state.rate_limiter
+    prompt_tokens = backend.count_tokens(prompt)
+    attempt = 0
+    while True:
+        queued_at = time.monotonic()
+        await limiter.acquire(prompt_tokens)
+        metrics.TOKENS.inc(prompt_tokens, direction="in")
+        try:
+            async with app.state.llm_slots:
+                limiter.record_wait(time.monotonic() - queued_at)
+                with metrics.UPSTREAM_SECONDS.time(mode="generate"):
+                    result = (await backend.generate(prompt, response_schema)).strip()
+            output_tokens = backend.count_tokens(result)
+            limiter.charge(output_tokens)
+            metrics.TOKENS.inc(output_tokens, direction="out")
+            return result
+        except Exception as e:
+            delay = limiter.backoff(e, attempt)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
 
-def handle_initial_analysis(model, input: CodeInput):
-    """Handle initial code analysis (existing logic)"""
+def stream_text(backend, prompt: str, response_schema: Optional[dict] = None, session_id: Optional[str] = None):
+    """Stream one model call; POST /cancel/{session_id} or a client disconnect stops it upstream"""
+    return app.state.cancellations.stream(stream_upstream(backend, prompt, response_schema), session_id)
+
+async def stream_upstream(backend, prompt: str, response_schema: Optional[dict] = None):
+    """Stream one model call chunk by chunk under the rate limiter and concurrency limit"""
+    limiter = app.state.rate_limiter
+    prompt_tokens = backend.count_tokens(prompt)
+    attempt = 0
+    while True:
+        queued_at = time.monotonic()
+        await limiter.acquire(prompt_tokens)
+        metrics.TOKENS.inc(prompt_tokens, direction="in")
+        output_tokens = 0
+        first_chunk_sent = False  # A whitespace-only chunk counts as zero tokens but has still been sent
+        try:
+            async with app.state.llm_slots:
+                limiter.record_wait(time.monotonic() - queued_at)
+                started = time.perf_counter()
+                async for text in backend.stream(prompt, response_schema):
+                    if not first_chunk_sent:
+                        metrics.UPSTREAM_TTFT_SECONDS.observe(time.perf_counter() - started)
+                        first_chunk_sent = True
+                    output_tokens += backend.count_tokens(text)
+                    yield text
+                metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - started, mode="stream")
+            limiter.charge(output_tokens)
+            metrics.TOKENS.inc(output_tokens, direction="out")
+            return
+        except asyncio.CancelledError:
+            # Tokens generated before the cancel still count against the quota
+            limiter.charge(output_tokens)
+            metrics.TOKENS.inc(output_tokens, direction="out")
+            raise
+        except Exception as e:
+            # Only retry if nothing has been sent to the client yet
+            delay = limiter.backoff(e, attempt) if not first_chunk_sent else None
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
+
+def is_chat_turn(input: CodeInput) -> bool:
+    return input.is_followup and bool(input.conversation_context or input.session_id)
+
+def resolve_history(input: CodeInput) -> List[Dict[str, str]]:
+    """Return the history for a chat turn, taking it from the request when the client resyncs"""
+    sessions = app.state.sessions
+    if input.conversation_context is not None:
+        history = list(input.conversation_context)
+        # The client sends the new user message as the last context entry too
+        if history and history[-1] == {"role": "user", "content": input.code}:
+            history.pop()
+        if input.session_id:
+            sessions.replace(input.session_id, history)
+        return history
+
+    session = sessions.get(input.session_id) if input.session_id else None
+    if session is None or (input.seq is not None and input.seq != session.seq):
+        raise HTTPException(status_code=409, detail={
+            "error": "Session out of sync, resend the full conversation_context",
+            "expected_seq": session.seq if session else 0
+        })
+    return list(session.messages)
+
+def record_turn(input: CodeInput, reply: str) -> Optional[int]:
+    """Append a finished chat turn to the server-side session and return its new seq"""
+    if not input.session_id:
+        return None
+    return app.state.sessions.append(input.session_id, [
+        {"role": "user", "content": input.code},
+        {"role": "assistant", "content": reply}
+    ])
+
+def start_session(input: CodeInput, value: dict) -> Optional[int]:
+    """Seed the server-side history the same way ConversationManager.start_new_session does"""
+    if not input.session_id:
+        return None
+    return app.state.sessions.replace(input.session_id, [
+        {"role": "system", "content": SESSION_SYSTEM_MESSAGE},
+        {"role": "user", "content": f"Analyze this code/problem: {input.code}"},
+        {"role": "assistant", "content": value["explanation"] + "\n\n" + value["fixes"]}
+    ]).seq
+
+def build_conversation_prompt(input: CodeInput, history: List[Dict[str, str]]) -> str:
+    """Build the follow-up prompt from the conversation history, within the token budget"""
+    with metrics.PROMPT_BUILD_SECONDS.time(kind="chat"):
+        return app.state.context_builder.build(input.session_id, history, input.code)
+
+async def run_local_checks(code: str) -> List[dict]:
+    """Findings from api.lint, computed in the worker process; [] if disabled, too big, too slow or failing"""
+    if app.state.lint_pool is None or len(code) > LOCAL_CHECK_MAX_CHARS:
+        return []  # A check that outlives the timeout keeps the only worker busy
+    loop = asyncio.get_running_loop()
+    try:
+        with metrics.LOCAL_CHECK_SECONDS.time():
+            return await asyncio.wait_for(
+                loop.run_in_executor(app.state.lint_pool, lint.check_code, code), LOCAL_CHECK_TIMEOUT_SECONDS
+            )
+    except Exception as e:
+        # The model still reviews the code; local findings are a head start, not a requirement
+        metrics.ERRORS.inc(type=type(e).__name__)
+        return []
+
+def build_analysis_prompt(code: str, findings: Optional[List[dict]] = None):
+    """Build the initial analysis prompt. Returns (prompt, is_question)."""
     
-    if is_programming_question(input.code):
+    with metrics.CLASSIFICATION_SECONDS.time():
+        is_question = is_programming_question(code)
+
+    with metrics.PROMPT_BUILD_SECONDS.time(kind="analysis"):
+        if OUTPUT_MODE == "json":
+            prompt = format_json_prompt(code, is_question)
+        else:
+            prompt, is_question = format_analysis_prompt(code, is_question)
+        if findings:
+            prompt += lint.format_findings_prompt(findings)
+        return prompt, is_question
+
+def format_analysis_prompt(code: str, is_question: bool) -> tuple:
+    """Fill in the question or code-snippet prompt template"""
+    if is_question:
         # Handle programming question
         prompt = f"""
         You are a coding assistant helping with programming problems. Analyze this programming question:
 
-        {input.code}
+        {code}
 
         Provide a comprehensive response with two parts:
 
@@ -136,34 +295,13 @@ def handle_initial_analysis(model, input: CodeInput):
         4. Ensure the solution covers all requirements
         5. If multiple approaches exist, provide the most efficient one
         """
+        return prompt, True
 
-        response = model.generate_content(prompt)
-        result = response.text.strip()
-
-        # Split response into explanation and solution parts
-        if "PART 2" in result:
-            parts = result.split("PART 2", 1)
-            explanation = parts[0].replace("PART 1 - EXPLANATION:", "").strip()
-            solution = "SOLUTION:\n" + parts[1].replace("- SOLUTION:", "").strip()
-        else:
-            # Fallback splitting method
-            lines = result.split('\n')
-            mid_point = len(lines) // 2
-            explanation = '\n'.join(lines[:mid_point])
-            solution = '\n'.join(lines[mid_point:])
-
-        return {
-            "explanation": explanation,
-            "fixes": solution,
-            "session_id": input.session_id
-        }
-
-    else:
-        # Handle code snippet (original logic)
-        prompt = f"""
+    # Handle code snippet (original logic)
+    prompt = f"""
         You are a coding assistant. Analyze the following code:
 
-        {input.code}
+        {code}
 
         Provide a comprehensive response with two parts:
 
@@ -179,47 +317,283 @@ def handle_initial_analysis(model, input: CodeInput):
         4. Suggest improvements or optimizations if needed
         5. Point out best practices or potential issues
         """
+    return prompt, False
+
+def plan_chunks(code: str) -> List[Chunk]:
+    """Chunks for a map-reduce analysis, or [] if the paste fits one prompt"""
+    # A paste this large is code (or a log), whatever the keyword classifier says, so it gets the code format
+    if not MAP_REDUCE_MIN_CHARS or len(code) < MAP_REDUCE_MIN_CHARS:
+        return []
+    chunk_chars = max(MAP_REDUCE_CHUNK_CHARS, -(-len(code) // MAP_REDUCE_MAX_CHUNKS))
+    chunks = split_code(code, chunk_chars)
+    return chunks if len(chunks) > 1 else []
+
+async def review_chunks(backend, chunks: List[Chunk]):
+    """Map step: review chunks concurrently under the rate limiter, yielding (index, review) as each finishes"""
+    slots = asyncio.Semaphore(MAP_REDUCE_CONCURRENCY)
 
-        response = model.generate_content(prompt)
-        result = response.text.strip()
+    async def review(index: int, chunk: Chunk):
+        prompt = format_chunk_prompt(chunk, index, len(chunks))
+        # Reviews are cached per chunk, so re-copying an edited file only re-reviews the parts that changed
+        cache_key = ResponseCache.make_key(backend.model_name, prompt)
+        cached = await app.state.cache.get(cache_key)
+        if cached is not None:
+            return index, cached["review"]
+        async with slots:
+            text = "".join([text async for text in stream_upstream(backend, prompt)]).strip()
+        app.state.cache.set(cache_key, {"review": text})
+        return index, text
 
-        # Split response into explanation and analysis parts
-        if "PART 2" in result:
-            parts = result.split("PART 2", 1)
-            explanation = parts[0].replace("PART 1 - CODE EXPLANATION:", "").strip()
-            analysis = "LINE-BY-LINE ANALYSIS:\n" + parts[1].replace("- LINE-BY-LINE ANALYSIS:", "").strip()
+    tasks = [asyncio.ensure_future(review(index, chunk)) for index, chunk in enumerate(chunks)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # One failed chunk fails the analysis; don't leave the others running
+        for task in tasks:
+            task.cancel()
+
+def build_reduce_prompt(chunks: List[Chunk], reviews: List[str], findings: Optional[List[dict]] = None) -> str:
+    with metrics.PROMPT_BUILD_SECONDS.time(kind="reduce"):
+        prompt = format_reduce_prompt(chunks, reviews, OUTPUT_MODE == "json")
+        if findings:
+            prompt += lint.format_findings_prompt(findings)
+        return prompt
+
+def split_analysis(result: str, is_question: bool):
+    """Split a PART 1 / PART 2 response into (explanation, fixes)"""
+    with metrics.SPLIT_SECONDS.time():
+        parser = new_section_parser(is_question)
+        parser.feed(result)
+        parser.close()
+        return parser.result()
+
+def analysis_schema() -> Optional[dict]:
+    return ANALYSIS_SCHEMA if OUTPUT_MODE == "json" else None
+
+def finish_analysis(result: str, is_question: bool) -> dict:
+    """Turn a complete model response into the cached/returned analysis value"""
+    if OUTPUT_MODE != "json":
+        explanation, fixes = split_analysis(result, is_question)
+        return {"explanation": explanation, "fixes": fixes}
+
+    with metrics.SPLIT_SECONDS.time():
+        try:
+            analysis = parse_analysis(result)
+        except StructuredOutputError as e:
+            # Show the raw reply rather than guess at a split; "structured": None keeps it out of the cache
+            metrics.ERRORS.inc(type=type(e).__name__)
+            return {"explanation": result, "fixes": str(e), "structured": None}
+        explanation, fixes = render_analysis(analysis, is_question)
+    return {"explanation": explanation, "fixes": fixes, "structured": analysis.model_dump()}
+
+def is_cacheable(value: dict) -> bool:
+    return value.get("structured", True) is not None
+
+async def handle_conversation(backend, input: CodeInput):
+    """Handle follow-up conversation with context"""
+    
+    history = resolve_history(input)
+    result = await generate_text(backend, build_conversation_prompt(input, history))
+    
+    return {
+        "explanation": "",  # Empty for chat mode
+        "fixes": "",       # Empty for chat mode  
+        "chat_response": result,
+        "session_id": input.session_id,
+        "seq": record_turn(input, result)
+    }
+
+async def handle_initial_analysis(backend, input: CodeInput):
+    """Handle initial code analysis (existing logic)"""
+    
+    code = normalize_code(input.code)
+    findings = await run_local_checks(code)
+    prompt, is_question = build_analysis_prompt(code, findings)
+    cache_key = ResponseCache.make_key(backend.model_name, prompt)
+    cached = await app.state.cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "findings": findings, "session_id": input.session_id, "seq": start_session(input, cached)}
+
+    async def run_analysis():
+        chunks = plan_chunks(code)
+        if chunks:
+            reviews = [None] * len(chunks)
+            async for index, review in review_chunks(backend, chunks):
+                reviews[index] = review
+            result = await generate_text(backend, build_reduce_prompt(chunks, reviews, findings), analysis_schema())
+            value = finish_analysis(result, False)
         else:
-            # Fallback: look for common separators
-            if "line by line" in result.lower():
-                parts = result.split("line by line", 1)
-                explanation = parts[0].strip()
-                analysis = "Line by line analysis:\n" + parts[1].strip()
-            else:
-                # Default split
-                lines = result.split('\n')
-                mid_point = len(lines) // 2
-                explanation = '\n'.join(lines[:mid_point])
-                analysis = '\n'.join(lines[mid_point:])
+            result = await generate_text(backend, prompt, analysis_schema())
+            value = finish_analysis(result, is_question)
+        if is_cacheable(value):
+            app.state.cache.set(cache_key, value)
+        return value
 
-        return {
-            "explanation": explanation,
-            "fixes": analysis,
-            "session_id": input.session_id
-        }
+    # Identical prompts already in flight share one upstream call
+    value = await app.state.singleflight.do(cache_key, run_analysis)
+    return {**value, "findings": findings, "session_id": input.session_id, "seq": start_session(input, value)}
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def sse_stream(events):
+    """Encode (event, data) pairs as server-sent events"""
+    async for event, data in events:
+        yield sse_event(event, data)
+
+async def stream_conversation(backend, input: CodeInput, history: List[Dict[str, str]]):
+    """Yield chat response chunks as (event, data) pairs"""
+    parts = []
+    try:
+        async for text in stream_text(backend, build_conversation_prompt(input, history), session_id=input.session_id):
+            parts.append(text)
+            yield ("delta", {"text": text})
+        result = "".join(parts).strip()
+        yield ("done", {
+            "chat_response": result,
+            "session_id": input.session_id,
+            "seq": record_turn(input, result)
+        })
+    except RequestCancelled:
+        return  # Asked for with POST /cancel and counted in clippy_cancelled_total; not an error
+    except Exception as e:
+        metrics.ERRORS.inc(type=type(e).__name__)
+        yield ("error", {
+            "chat_response": f"Error: {str(e)}",
+            "retry_after": getattr(e, "retry_after", None)
+        })
+
+async def lead_analysis(backend, flight: asyncio.Future, cache_key: str, code: str, prompt: str,
+                        is_question: bool, findings: List[dict], events: asyncio.Queue):
+    """Upstream side of a streamed analysis: puts (event, data) pairs on events, then None, and resolves flight"""
+    try:
+        chunks = plan_chunks(code)
+        if chunks:
+            # Large paste: review the chunks, then stream the merged analysis like a normal one
+            reviews = [None] * len(chunks)
+            events.put_nowait(("progress", {"stage": "map", "done": 0, "total": len(chunks)}))
+            async for index, review in review_chunks(backend, chunks):
+                reviews[index] = review
+                done = sum(review is not None for review in reviews)
+                events.put_nowait(("progress", {
+                    "stage": "map", "done": done, "total": len(chunks),
+                    "lines": [chunks[index].start, chunks[index].end]
+                }))
+            events.put_nowait(("progress", {"stage": "reduce", "done": len(chunks), "total": len(chunks)}))
+            prompt, is_question = build_reduce_prompt(chunks, reviews, findings), False
+
+        if OUTPUT_MODE == "json":
+            # Partial JSON can't be rendered, so the panes fill in once the reply is validated
+            parts = [text async for text in stream_upstream(backend, prompt, ANALYSIS_SCHEMA)]
+            value = finish_analysis("".join(parts).strip(), is_question)
+            events.put_nowait(("delta", {"channel": "explanation", "text": value["explanation"]}))
+            events.put_nowait(("delta", {"channel": "fixes", "text": value["fixes"]}))
+        else:
+            parser = new_section_parser(is_question)
+            split_seconds = 0.0  # Parser time only, not time spent waiting on the model
+            async for text in stream_upstream(backend, prompt):
+                started = time.perf_counter()
+                pieces = parser.feed(text)
+                split_seconds += time.perf_counter() - started
+                for channel, piece in pieces:
+                    events.put_nowait(("delta", {"channel": channel, "text": piece}))
+            for channel, piece in parser.close():
+                events.put_nowait(("delta", {"channel": channel, "text": piece}))
+            explanation, fixes = parser.result()
+            metrics.SPLIT_SECONDS.observe(split_seconds)
+            value = {"explanation": explanation, "fixes": fixes}
+        if is_cacheable(value):
+            app.state.cache.set(cache_key, value)
+        flight.set_result(value)
+    except Exception as e:
+        flight.set_exception(e)
+    finally:
+        if not flight.done():
+            # Cancelled once no client was left waiting
+            flight.set_exception(RuntimeError("Streaming analysis was interrupted"))
+        events.put_nowait(None)
+
+async def stream_initial_analysis(backend, input: CodeInput):
+    """Yield analysis chunks as (event, data) pairs routed to the explanation or fixes channel"""
+    try:
+        code = normalize_code(input.code)
+        findings = await run_local_checks(code)
+        if findings:
+            # Shown right away, seconds before the model's first token
+            yield ("findings", {"findings": findings, "markdown": lint.format_findings(findings)})
+        prompt, is_question = build_analysis_prompt(code, findings)
+        cache_key = ResponseCache.make_key(backend.model_name, prompt)
+        value = await app.state.cache.get(cache_key)
+        if value is None and app.state.singleflight.pending(cache_key):
+            # Same prompt already in flight: wait for it instead of a second upstream call
+            value = await app.state.singleflight.do(cache_key, None)
+
+        if value is not None:
+            yield ("delta", {"channel": "explanation", "text": value["explanation"]})
+            yield ("delta", {"channel": "fixes", "text": value["fixes"]})
+        else:
+            # The upstream call runs as its own task, like SingleFlight.do, so coalesced waiters
+            # keep their result if this client cancels or goes away
+            flight = app.state.singleflight.lead(cache_key)
+            events = asyncio.Queue()
+            producer = asyncio.ensure_future(
+                lead_analysis(backend, flight, cache_key, code, prompt, is_question, findings, events)
+            )
+            detach = Detach(events)
+            app.state.cancellations.register(input.session_id, detach)
+            finished = False
+            try:
+                while True:
+                    item = await events.get()
+                    if item is None:
+                        break
+                    if isinstance(item, RequestCancelled):
+                        app.state.cancellations.cancelled["request"] += 1
+                        finished = True
+                        raise item
+                    yield item
+                finished = True
+                value = flight.result()  # Resolved before the producer's end marker
+            finally:
+                app.state.cancellations.forget(input.session_id, detach)
+                if not finished:
+                    app.state.cancellations.cancelled["client"] += 1
+                if not producer.done() and not app.state.singleflight.waiting(cache_key):
+                    producer.cancel()  # Nobody else is waiting for it
+
+        yield ("done", {
+            **value,
+            "session_id": input.session_id,
+            "seq": start_session(input, value)
+        })
+    except RequestCancelled:
+        return  # Asked for with POST /cancel and counted in clippy_cancelled_total; not an error
+    except Exception as e:
+        metrics.ERRORS.inc(type=type(e).__name__)
+        yield ("error", {
+            "explanation": "Failed to get response from Gemini.",
+            "fixes": str(e),
+            "retry_after": getattr(e, "retry_after", None)
+        })
 
 @app.post("/analyze")
-def analyze_code(input: CodeInput):
+async def analyze_code(input: CodeInput):
     try:
-        model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
+        backend = app.state.backend
         
-        if input.is_followup and input.conversation_context:
+        if is_chat_turn(input):
             # Handle follow-up conversation
-            return handle_conversation(model, input)
+            return await handle_conversation(backend, input)
         else:
             # Handle initial analysis
-            return handle_initial_analysis(model, input)
+            return await handle_initial_analysis(backend, input)
     
+    except (HTTPException, RateLimitExceeded):
+        raise
     except Exception as e:
+        metrics.ERRORS.inc(type=type(e).__name__)
         return {
             "explanation": "Failed to get response from Gemini.",
             "fixes": str(e),
@@ -227,18 +601,140 @@ def analyze_code(input: CodeInput):
         }
 
 @app.post("/chat")
-def chat_endpoint(input: CodeInput):
+async def chat_endpoint(input: CodeInput):
     """Dedicated chat endpoint for follow-up conversations"""
     try:
-        model = genai.GenerativeModel(model_name="models/gemini-1.5-flash")
-        return handle_conversation(model, input)
+        return await handle_conversation(app.state.backend, input)
+    except (HTTPException, RateLimitExceeded):
+        raise
     except Exception as e:
+        metrics.ERRORS.inc(type=type(e).__name__)
         return {
             "explanation": "",
             "fixes": "",
             "chat_response": f"Error: {str(e)}"
         }
 
+def open_analysis_stream(input: CodeInput):
+    """Admit an analysis or chat turn and return its (event, data) stream (SSE and in-process clients)"""
+    backend = app.state.backend
+    app.state.rate_limiter.check_capacity()
+    if is_chat_turn(input):
+        return stream_conversation(backend, input, resolve_history(input))
+    return stream_initial_analysis(backend, input)
+
+def open_chat_stream(input: CodeInput):
+    """Admit a chat turn and return its (event, data) stream"""
+    app.state.rate_limiter.check_capacity()
+    return stream_conversation(app.state.backend, input, resolve_history(input))
+
+@app.post("/analyze/stream")
+async def analyze_code_stream(input: CodeInput):
+    """Stream the analysis as server-sent events"""
+    return StreamingResponse(sse_stream(open_analysis_stream(input)), media_type="text/event-stream")
+
+@app.post("/chat/stream")
+async def chat_stream(input: CodeInput):
+    """Stream a chat response as server-sent events"""
+    return StreamingResponse(sse_stream(open_chat_stream(input)), media_type="text/event-stream")
+
+async def run_batch(items: List[CodeInput], concurrency: int):
+    """Yield NDJSON lines in completion order, analyzing at most concurrency items at once"""
+    backend = app.state.backend
+    pending = asyncio.Queue()
+    for index, item in enumerate(items):
+        pending.put_nowait((index, item))
+    finished = asyncio.Queue()
+
+    async def analyze_one(index: int, item: CodeInput) -> dict:
+        try:
+            if is_chat_turn(item):
+                result = await handle_conversation(backend, item)
+            else:
+                result = await handle_initial_analysis(backend, item)
+            return {"index": index, "ok": True, "result": result}
+        except Exception as e:
+            # One failed item must not fail the batch
+            metrics.ERRORS.inc(type=type(e).__name__)
+            return {
+                "index": index,
+                "ok": False,
+                "status": getattr(e, "status_code", 500),
+                "error": e.detail if isinstance(e, HTTPException) else str(e),
+                "retry_after": getattr(e, "retry_after", None)
+            }
+
+    async def worker():
+        while not pending.empty():
+            index, item = pending.get_nowait()
+            await finished.put(await analyze_one(index, item))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(items)))]
+    try:
+        for _ in items:
+            yield json.dumps(await finished.get()) + "\n"
+    finally:
+        # Client went away: stop starting new items
+        for task in workers:
+            task.cancel()
+
+@app.post("/analyze/batch")
+async def analyze_batch(batch: BatchInput):
+    """Analyze many inputs concurrently, streaming one NDJSON result per line as each finishes"""
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    app.state.rate_limiter.check_capacity()
+    concurrency = max(1, min(batch.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    return StreamingResponse(run_batch(batch.items, concurrency), media_type="application/x-ndjson")
+
+@app.post("/cancel/{session_id}")
+async def cancel_session(session_id: str):
+    """Stop the upstream calls of a session's in-flight streams"""
+    return {"cancelled": app.state.cancellations.cancel(session_id)}
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe; touches no shared state"""
+    return {"status": "ok"}
+
+@app.get("/stats")
+async def stats():
+    """Cache, request coalescing, session store and rate limiter counters"""
+    return {
+        "cache": await app.state.cache.snapshot(),
+        "deduplicated_requests": app.state.singleflight.deduplicated,
+        "sessions": {
+            "active": len(app.state.sessions.sessions),
+            "chars": app.state.sessions.total_chars,
+            "evictions": app.state.sessions.evictions
+        },
+        "rate_limiter": {**app.state.rate_limiter.stats, "waiting": app.state.rate_limiter.waiting},
+        "cancelled": app.state.cancellations.cancelled
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-stage timings and counters in the Prometheus text format"""
+    cache = await app.state.cache.snapshot()
+    limiter = app.state.rate_limiter
+    cancelled = app.state.cancellations.cancelled
+    extra = [
+        ("clippy_cache_hits_total", "counter", "Response cache hits, by tier",
+         {(("tier", "memory"),): cache["memory_hits"], (("tier", "disk"),): cache["disk_hits"]}),
+        ("clippy_cache_misses_total", "counter", "Response cache misses", {(): cache["misses"]}),
+        ("clippy_deduplicated_requests_total", "counter", "Requests coalesced onto an in-flight upstream call",
+         {(): app.state.singleflight.deduplicated}),
+        ("clippy_upstream_retries_total", "counter", "Upstream calls retried after a quota error",
+         {(): limiter.stats["retries"]}),
+        ("clippy_rate_limit_rejected_total", "counter", "Requests rejected because the wait queue was full",
+         {(): limiter.stats["rejected"]}),
+        ("clippy_rate_limit_waiting", "gauge", "Requests waiting for upstream quota", {(): limiter.waiting}),
+        ("clippy_cancelled_total", "counter", "Streams stopped before completion: client went away or POST /cancel",
+         {(("reason", "client"),): cancelled["client"], (("reason", "request"),): cancelled["request"]}),
+        ("clippy_sessions_active", "gauge", "Chat sessions held server-side", {(): len(app.state.sessions.sessions)}),
+    ]
+    return PlainTextResponse(metrics.REGISTRY.render(extra), media_type="text/plain; version=0.0.4")
+
 # ✅ Allow server to run when started directly
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+def _message_size(msg: Dict[str, str]) -> int:
+    return len(msg["role"]) + len(msg["content"])
+
+@dataclass
+class Session:
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    size: int = 0  # approximate size in characters
+    last_used: float = 0.0
+
+    @property
+    def seq(self) -> int:
+        return len(self.messages)
+
+class SessionStore:
+    """Server-side chat history keyed by session_id, bounded by total size and idle time"""
+
+    def __init__(self, max_chars: int, idle_ttl: float):
+        self.max_chars = max_chars
+        self.idle_ttl = idle_ttl
+        self.sessions = OrderedDict()  # session_id -> Session, least recently used first
+        self.total_chars = 0
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Optional[Session]:
+        self._evict_idle()
+        session = self.sessions.get(session_id)
+        if session is not None:
+            self._touch(session_id, session)
+        return session
+
+    def replace(self, session_id: str, messages: List[Dict[str, str]]) -> Session:
+        """Reset a session's history (new analysis or client resync)"""
+        old = self.sessions.pop(session_id, None)
+        if old is not None:
+            self.total_chars -= old.size
+        session = Session(list(messages), sum(_message_size(msg) for msg in messages))
+        self.sessions[session_id] = session
+        self.total_chars += session.size
+        self._touch(session_id, session)
+        self._evict_idle()  # After the touch, so never this session; analyze-only traffic never calls get()
+        self._evict_over_cap()
+        return session
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]) -> int:
+        """Add messages to a session and return its new sequence number"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return self.replace(session_id, messages).seq
+        added = sum(_message_size(msg) for msg in messages)
+        session.messages.extend(messages)
+        session.size += added
+        self.total_chars += added
+        self._touch(session_id, session)
+        self._evict_idle()  # After the touch, so never this session; analyze-only traffic never calls get()
+        self._evict_over_cap()
+        return session.seq
+
+    def _touch(self, session_id: str, session: Session) -> None:
+        session.last_used = time.monotonic()
+        self.sessions.move_to_end(session_id)
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            self._evict(session_id)
+
+    def _evict_over_cap(self) -> None:
+        # Never evict the session that was just used, even if it alone is over the cap
+        while self.total_chars > self.max_chars and len(self.sessions) > 1:
+            self._evict(next(iter(self.sessions)))
+
+    def _evict(self, session_id: str) -> None:
+        session = self.sessions.pop(session_id)
+        self.total_chars -= session.size
+        self.evictions += 1
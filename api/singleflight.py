@@ -0,0 +1,50 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+class SingleFlight:
+    """Coalesces identical in-flight calls so they share one upstream request"""
+
+    def __init__(self):
+        self.inflight = {}  # key -> asyncio.Future shared by every waiter
+        self.waiters = {}  # key -> callers currently awaiting it through do()
+        self.deduplicated = 0
+
+    def pending(self, key: str) -> Optional[asyncio.Future]:
+        return self.inflight.get(key)
+
+    def waiting(self, key: str) -> int:
+        return self.waiters.get(key, 0)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Run fn() once per key; concurrent callers with the same key get its result or error"""
+        shared = self.inflight.get(key)
+        if shared is None:
+            # Run as its own task so a disconnecting caller does not cancel the others
+            shared = asyncio.ensure_future(fn())
+            self._track(key, shared)
+        else:
+            self.deduplicated += 1
+        self.waiters[key] = self.waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(shared)
+        finally:
+            self.waiters[key] -= 1
+            if not self.waiters[key]:
+                del self.waiters[key]
+
+    def lead(self, key: str) -> asyncio.Future:
+        """Register a caller that produces the result itself (e.g. while streaming it)"""
+        future = asyncio.get_running_loop().create_future()
+        self._track(key, future)
+        return future
+
+    def _track(self, key: str, future: asyncio.Future) -> None:
+        self.inflight[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self.inflight.get(key) is future:
+            del self.inflight[key]
+        # Mark the error as retrieved even when nobody else was waiting
+        if not future.cancelled():
+            future.exception()
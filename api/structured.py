@@ -0,0 +1,109 @@
+import re
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+class CodeBlock(BaseModel):
+    language: str = "python"
+    code: str
+
+class Complexity(BaseModel):
+    time: str = ""
+    space: str = ""
+
+class LineNote(BaseModel):
+    line: str  # The line of code the note refers to
+    note: str
+
+class StructuredAnalysis(BaseModel):
+    explanation: str
+    solution: List[CodeBlock] = []
+    complexity: Optional[Complexity] = None
+    line_notes: List[LineNote] = []
+
+# Same shape as StructuredAnalysis, in the OpenAPI subset Gemini accepts as response_schema
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "explanation": {"type": "string"},
+        "solution": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"language": {"type": "string"}, "code": {"type": "string"}},
+                "required": ["language", "code"],
+            },
+        },
+        "complexity": {
+            "type": "object",
+            "properties": {"time": {"type": "string"}, "space": {"type": "string"}},
+        },
+        "line_notes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"line": {"type": "string"}, "note": {"type": "string"}},
+                "required": ["line", "note"],
+            },
+        },
+    },
+    "required": ["explanation", "solution", "line_notes"],
+}
+
+class StructuredOutputError(Exception):
+    """The model's JSON did not match StructuredAnalysis"""
+
+# Models occasionally wrap JSON in a markdown fence despite the MIME type
+_FENCE = re.compile(r"^\s*```(?:json)?\s*\n(.*)\n\s*```\s*$", re.DOTALL)
+
+def format_json_prompt(code: str, is_question: bool) -> str:
+    """Ask for the analysis as JSON matching ANALYSIS_SCHEMA"""
+    if is_question:
+        return f"""
+        You are a coding assistant helping with programming problems. Analyze this programming question:
+
+        {code}
+
+        Respond with JSON only:
+        - "explanation": explain the problem, the concepts and algorithms involved, the optimal approach and the edge cases (markdown)
+        - "solution": the most optimized solution in Python (or the language specified in the question), with comments, as code blocks
+        - "complexity": the solution's time and space complexity in big-O notation
+        - "line_notes": notes on the key lines of the solution
+        """
+    return f"""
+        You are a coding assistant. Analyze the following code:
+
+        {code}
+
+        Respond with JSON only:
+        - "explanation": what the code does, its purpose and the programming concepts used (markdown)
+        - "line_notes": for each significant line, the line itself and an explanation, highlighting syntax or logical errors and best practices
+        - "solution": corrected or improved code as code blocks, or an empty list if no changes are needed
+        - "complexity": the code's time and space complexity in big-O notation
+        """
+
+def parse_analysis(text: str) -> StructuredAnalysis:
+    """Parse and validate the model's JSON in one pass"""
+    match = _FENCE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        return StructuredAnalysis.model_validate_json(text)
+    except ValidationError as e:
+        raise StructuredOutputError(f"Model returned invalid structured output: {e.error_count()} errors") from e
+
+def render_analysis(analysis: StructuredAnalysis, is_question: bool) -> Tuple[str, str]:
+    """Render (explanation, fixes) markdown for the existing two-pane UI"""
+    explanation = analysis.explanation.strip()
+    if analysis.complexity and (analysis.complexity.time or analysis.complexity.space):
+        explanation += f"\n\n**Complexity:** time {analysis.complexity.time or 'n/a'}, space {analysis.complexity.space or 'n/a'}"
+
+    blocks = [f"```{block.language}\n{block.code.strip()}\n```" for block in analysis.solution]
+    notes = [f"**{note.line.strip()}**\n{note.note.strip()}" for note in analysis.line_notes]
+
+    # Same titles the PART 2 parser produces
+    if is_question:
+        fixes = "SOLUTION:\n" + "\n\n".join(blocks + notes)
+    else:
+        fixes = "LINE-BY-LINE ANALYSIS:\n" + "\n\n".join(notes + blocks)
+    return explanation, fixes
@@ -0,0 +1,172 @@
+"""Benchmark and parity check for the is_programming_question classifier.
+
+Compares the original implementation with the early-exit one in
+api/classifier.py on small, medium and 5 MB inputs and on 2000 varied short
+pastes, after checking that both agree on a labelled corpus and on randomly
+generated text.
+
+Usage: python benchmarks/bench_classifier.py [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.classifier import (  # noqa: E402
+    CODE_PATTERNS, QUESTION_INDICATORS, QUESTION_KEYWORDS, is_programming_question
+)
+
+def legacy_is_programming_question(text):
+    """Original multi-pass implementation, kept as the reference for parity."""
+    # Remove "Additional Context:" part for detection
+    main_text = text.split("Additional Context:")[0] if "Additional Context:" in text else text
+    
+    # Keywords that indicate a programming question
+    question_keywords = [
+        "explain", "how", "what", "why", "solve", "implement", "algorithm", 
+        "data structure", "leetcode", "problem", "challenge", "task", 
+        "function", "write", "return", "input", "output", "constraints", 
+        "example", "given", "find", "determine", "calculate", "optimize",
+        "time complexity", "space complexity", "array", "string", "tree",
+        "graph", "dynamic programming", "greedy", "binary search", "sort",
+        "medium", "hard", "easy", "difficulty", "solution", "approach"
+    ]
+    
+    # Question indicators
+    question_indicators = [
+        "?", "given:", "input:", "output:", "example:", "constraint", 
+        "note:", "follow up:", "can you", "write a", "implement a",
+        "design a", "create a", "build a"
+    ]
+    
+    text_lower = main_text.lower()
+    
+    # Check for question marks or indicators
+    for indicator in question_indicators:
+        if indicator in text_lower:
+            return True
+    
+    # Check for question keywords
+    keyword_count = sum(1 for keyword in question_keywords if keyword in text_lower)
+    
+    # If multiple keywords found, likely a question
+    if keyword_count >= 2:
+        return True
+    
+    # Check if it looks like code (has common code patterns)
+    code_patterns = ["def ", "class ", "import ", "from ", "=", "{", "}", ";", "//", "/*"]
+    code_pattern_count = sum(1 for pattern in code_patterns if pattern in main_text)
+    
+    # If has many code patterns and few question keywords, likely code
+    if code_pattern_count >= 3 and keyword_count < 2:
+        return False
+    
+    # Default: if has question keywords, treat as question
+    return keyword_count > 0
+
+# (text, is_question) pairs covering each branch of the decision
+LABELLED_CORPUS = [
+    ("Given an array of integers nums, return indices of the two numbers.", True),
+    ("What does this do?", True),
+    ("Input: nums = [2,7,11,15]\nOutput: [0,1]", True),
+    ("Can you reverse a linked list", True),
+    ("Design a LRU cache", True),
+    ("follow up: could you do it in O(1) space", True),
+    ("Constraints: 1 <= n <= 10^5", True),
+    ("explain the greedy approach", True),
+    ("sort the tree", True),
+    ("def add(a, b):\n    return a + b", True),
+    ("import os\nfrom sys import argv\nx = 1\nreturn x;", False),
+    ("class Foo { int x = 1; }", False),
+    ("x = 1", False),
+    ("int main() { printf(\"hi\"); }", False),
+    ("#include <stdio.h>", False),
+    ("SELECT * FROM users", False),
+    ("IMPORT x = {1}; // HOW", False),
+    ("for i in range(10): print(i)", False),
+    ("showhy", True),
+    ("constraints", True),
+    ("Write A function", True),
+    ("tree = {}; // leaf", False),
+    ("while True:\n    pass\n\nAdditional Context: why does this hang?", False),
+    ("x = {}; y = 2;\n\nAdditional Context: how and why", False),
+    ("", False),
+]
+
+def check_parity(samples=5000, seed=1234):
+    """Both implementations must agree with the labels and with each other"""
+    for text, expected in LABELLED_CORPUS:
+        legacy = legacy_is_programming_question(text)
+        fast = is_programming_question(text)
+        assert legacy == expected, f"label mismatch for {text!r}: legacy={legacy}"
+        assert fast == expected, f"parity mismatch for {text!r}: fast={fast}"
+
+    # Random text stitched from the matcher's own vocabulary, including
+    # overlapping and partial terms, mixed case and the context separator
+    rng = random.Random(seed)
+    vocabulary = list(QUESTION_KEYWORDS + QUESTION_INDICATORS + CODE_PATTERNS) + [
+        "Additional Context:", "HOW", "Sort", "in", "put", "con", "straint", "\n", " ", "x", "sh", "wh"
+    ]
+    for _ in range(samples):
+        text = "".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 12)))
+        assert legacy_is_programming_question(text) == is_programming_question(text), text
+    print(f"✅ Parity OK ({len(LABELLED_CORPUS)} labelled, {samples} random samples)")
+
+def make_inputs():
+    question = "Given an array nums, return the maximum subarray sum. Example: ..."
+    code_line = "    total = compute(values[i]) {x}; // update\n"
+    return {
+        "small": question,
+        "medium": code_line * 200,
+        # Worst case: a single keyword at the very end, so every pattern is searched
+        "5mb": code_line * (5 * 1024 * 1024 // len(code_line)) + "return total\n",
+        # A question with a large log pasted after it
+        "5mb-question": question + "\n" + code_line * (5 * 1024 * 1024 // len(code_line)),
+    }
+
+def make_varied(count=2000, seed=0):
+    """Short pastes of about 300 chars, mixing prose, code and question words like real clipboard text"""
+    rng = random.Random(seed)
+    prose = "the a value list node sum index loop result total count item data user file path error line of to in for".split()
+    code = ["x = 1;", "def f(a):", "{", "}", "return a", "import os", "// note", "print(x)"]
+    questions = ["how", "why?", "array", "given"]
+    texts = []
+    for i in range(count):
+        words = prose + (code if i % 2 else []) + (questions if i % 3 == 0 else [])
+        text = ""
+        while len(text) < 300:
+            text += rng.choice(words) + rng.choice(" \n")
+        texts.append(text)
+    return texts
+
+def bench(fn, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per input (best time is reported)")
+    args = parser.parse_args()
+
+    check_parity()
+
+    print(f"{'input':>12} {'size':>10} {'legacy':>12} {'early-exit':>12} {'speedup':>8}")
+    inputs = {name: [text] for name, text in make_inputs().items()}
+    inputs["varied-2000"] = make_varied()
+    for name, texts in inputs.items():
+        assert all(legacy_is_programming_question(text) == is_programming_question(text) for text in texts)
+        legacy = bench(legacy_is_programming_question, texts, args.repeat)
+        fast = bench(is_programming_question, texts, args.repeat)
+        size = sum(len(text) for text in texts)
+        print(f"{name:>12} {size:>10} {legacy * 1e3:>10.3f}ms {fast * 1e3:>10.3f}ms {legacy / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Labelled-corpus check for the local checks in api/lint.py.
+
+Each paste is run through check_code and the kinds of its findings are compared
+with the expected ones, so pasted problem statements never get a made-up syntax
+error and broken code still does. Exits with status 1 on a mismatch.
+
+Usage: python benchmarks/check_lint.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.lint import check_code  # noqa: E402
+
+LEETCODE_PROBLEM = """Given an integer array nums, return the number of longest increasing subsequences.
+
+Notice that the sequence has to be strictly increasing.
+
+Example 1:
+Input: nums = [1,3,5,4,7]
+Output: 2
+
+Constraints:
+1 <= nums.length <= 2000
+
+class Solution:
+    def findNumberOfLIS(self, nums: List[int]) -> int:
+        """
+
+# (paste, expected finding kinds in order)
+LABELLED_CORPUS = [
+    # Problem statement plus an empty stub: the app's main use case
+    (LEETCODE_PROBLEM, []),
+    ("Two Sum\nGiven an array of integers, return indices of the two numbers.\n\nclass Solution:\n    def twoSum(self, nums, target):",
+     []),
+    # A stub alone is not an error either
+    ("class Solution:\n    def maxProfit(self, prices: List[int]) -> int:\n", []),
+    # Broken code is still reported
+    ("def f(x)\n    return x", ["syntax"]),
+    ("class A:\n    def f(self):\n        return 1 +", ["syntax"]),
+    ("import os\nx, y = 1, 2\nprint(x\n", ["syntax"]),
+    ("def f(a):\n    return a + b\n", ["undefined-name"]),
+    ("out = ''\nfor x in range(3):\n    out += str(x)\n", ["performance"]),
+    ("Hello, see you tomorrow.", []),
+]
+
+def check_corpus():
+    failures = 0
+    for paste, expected in LABELLED_CORPUS:
+        kinds = [item["kind"] for item in check_code(paste)]
+        if kinds != expected:
+            failures += 1
+            print(f"❌ {paste[:40]!r}: expected {expected}, got {kinds}")
+    if failures:
+        return False
+    print(f"✅ Local checks OK ({len(LABELLED_CORPUS)} labelled pastes)")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if check_corpus() else 1)
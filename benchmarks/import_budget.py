@@ -0,0 +1,82 @@
+"""Cold-start import budget for the desktop app.
+
+Imports main.py in a fresh interpreter under `python -X importtime` and fails
+(exit status 1) if the import takes longer than the budget, or if it pulls in
+a module that should only load in the background warm-up (see warm_up in
+main.py).
+
+Usage:
+    python benchmarks/import_budget.py --budget-ms 120 --runs 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded by warm_up or the server thread, never before the window is up
+DEFERRED_MODULES = (
+    "api.server",
+    "asyncio",
+    "fastapi",
+    "google.generativeai",
+    "markdown",
+    "requests",
+    "uvicorn",
+)
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Map module name -> (self us, cumulative us) from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def measure(module: str = "main") -> Dict[str, Tuple[int, int]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def check(budget_ms: float, runs: int = 3, module: str = "main") -> List[str]:
+    """Return the budget violations (empty if within budget); reports the best of runs"""
+    samples = [measure(module) for _ in range(runs)]
+    best = min(samples, key=lambda modules: modules[module][1])
+    total_ms = best[module][1] / 1000
+
+    print(f"📊 import {module}: {total_ms:.1f}ms cumulative (best of {runs}, budget {budget_ms:.0f}ms)")
+    for name, (_, cumulative) in sorted(best.items(), key=lambda item: -item[1][1])[:10]:
+        print(f"   {cumulative / 1000:8.1f}ms  {name}")
+
+    failures = []
+    if total_ms > budget_ms:
+        failures.append(f"import {module} took {total_ms:.1f}ms, over the {budget_ms:.0f}ms budget")
+    for name in DEFERRED_MODULES:
+        if name in best:
+            failures.append(f"{name} is imported at startup; it should load lazily or in warm_up")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the desktop app's cold-start import time")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("CLIPPY_IMPORT_BUDGET_MS", "120")))
+    parser.add_argument("--runs", type=int, default=3, help="take the fastest of this many cold imports")
+    parser.add_argument("--module", default="main")
+    args = parser.parse_args(argv)
+
+    failures = check(args.budget_ms, args.runs, args.module)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Within the import budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
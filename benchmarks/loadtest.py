@@ -0,0 +1,268 @@
+"""Load generator for the ClippyAI FastAPI server.
+
+Drives /analyze and /chat with a configurable mix, concurrency and duration,
+either against the in-process app (api.server:app, any backend) or against a
+running server (--url). Reports p50/p95/p99 latency, throughput, error rate and
+upstream queueing delay, and writes the results as JSON for before/after runs.
+
+The in-process server is configured with the usual CLIPPY_* environment
+variables, e.g. CLIPPY_RATE_LIMIT_RPM or CLIPPY_FAKE_LATENCY_MS.
+
+Usage:
+    python benchmarks/loadtest.py --backend fake --concurrency 50 --duration 30 \\
+        --mix analyze=0.8,chat=0.2 --output results.json
+
+As a pytest fixture (pytest_plugins = ["benchmarks.loadtest"]):
+    def test_overhead(load_test):
+        results = load_test(concurrency=20, duration=5)
+        assert results["error_rate"] == 0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_QUESTIONS = [
+    "Given an array of integers nums and an integer target, return indices of the two numbers such that they add up to target.",
+    "Given a string s, find the length of the longest substring without repeating characters.",
+    "Merge k sorted linked lists and return it as one sorted list. What is the time complexity?",
+]
+
+SAMPLE_SNIPPETS = [
+    "def fib(n):\n    return n if n < 2 else fib(n - 1) + fib(n - 2)",
+    "import os\nfor root, dirs, files in os.walk('.'):\n    print(root, len(files))",
+    "const total = items.reduce((sum, x) => sum + x.price, 0);",
+]
+
+@dataclass
+class LoadTestConfig:
+    concurrency: int = 10
+    duration: float = 10.0
+    mix: Dict[str, float] = field(default_factory=lambda: {"analyze": 0.8, "chat": 0.2})
+    backend: str = "fake"
+    url: Optional[str] = None  # None drives the in-process app
+    stream: bool = False
+    repeat_ratio: float = 0.0  # Share of analyze requests that reuse a sample verbatim (cache hits)
+    timeout: float = 60.0
+    seed: int = 0
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize_latencies(latencies: List[float]) -> dict:
+    ordered = sorted(latencies)
+    to_ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        "count": len(ordered),
+        "mean_ms": to_ms(sum(ordered) / len(ordered)) if ordered else None,
+        "p50_ms": to_ms(percentile(ordered, 50)),
+        "p95_ms": to_ms(percentile(ordered, 95)),
+        "p99_ms": to_ms(percentile(ordered, 99)),
+        "max_ms": to_ms(ordered[-1]) if ordered else None,
+    }
+
+def classify_response(response) -> str:
+    """'ok', or a short error label (the server reports some failures inside a 200 body)"""
+    if response.status_code != 200:
+        return f"http_{response.status_code}"
+    body = response.text
+    if "event: error" in body or "Failed to get response" in body or '"chat_response": "Error: ' in body:
+        return "upstream_error"
+    return "ok"
+
+@asynccontextmanager
+async def open_client(config: LoadTestConfig):
+    """HTTP client for a remote server, or an ASGI client with the app's lifespan running"""
+    if config.url:
+        async with httpx.AsyncClient(base_url=config.url, timeout=config.timeout) as client:
+            yield client
+        return
+
+    from api import server
+
+    server.LLM_BACKEND = config.backend
+    server.CACHE_PATH = ""  # Keep load-test responses out of the user's on-disk cache
+    async with server.lifespan(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=config.timeout) as client:
+            yield client
+
+def make_request(kind: str, worker: int, counter: int, config: LoadTestConfig, rng: random.Random):
+    """Build (path, json) for one request of the given kind"""
+    if kind == "chat":
+        session_id = f"loadtest_{worker}"
+        context = [
+            {"role": "system", "content": "You are ClippyAI, helping with code analysis and debugging."},
+            {"role": "user", "content": f"Analyze this code/problem: {rng.choice(SAMPLE_SNIPPETS)}"},
+            {"role": "assistant", "content": "It computes a value."},
+        ]
+        path = "/chat/stream" if config.stream else "/chat"
+        return path, {
+            "code": f"Can you optimize this? (#{counter})",
+            "session_id": session_id,
+            "is_followup": True,
+            "conversation_context": context,
+        }
+
+    text = rng.choice(SAMPLE_QUESTIONS + SAMPLE_SNIPPETS)
+    if rng.random() >= config.repeat_ratio:
+        text += f"\n# variant {worker}-{counter}"
+    path = "/analyze/stream" if config.stream else "/analyze"
+    return path, {"code": text, "session_id": f"loadtest_{worker}_{counter}", "is_followup": False}
+
+async def run_load_test(config: LoadTestConfig) -> dict:
+    kinds = list(config.mix)
+    weights = [config.mix[kind] for kind in kinds]
+    records = []  # (kind, latency seconds, status or error name)
+
+    async with open_client(config) as client:
+        before = (await client.get("/stats")).json()
+        started = time.perf_counter()
+        deadline = started + config.duration
+
+        async def worker(index: int):
+            rng = random.Random(config.seed * 100003 + index)
+            counter = 0
+            while time.perf_counter() < deadline:
+                kind = rng.choices(kinds, weights)[0]
+                path, payload = make_request(kind, index, counter, config, rng)
+                counter += 1
+                sent = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload)
+                    outcome = classify_response(response)
+                except Exception as e:
+                    outcome = type(e).__name__
+                records.append((kind, time.perf_counter() - sent, outcome))
+
+        await asyncio.gather(*(worker(i) for i in range(config.concurrency)))
+        elapsed = time.perf_counter() - started
+        after = (await client.get("/stats")).json()
+
+    outcomes = {}
+    for _, _, outcome in records:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    errors = len(records) - outcomes.get("ok", 0)
+
+    limiter_before, limiter_after = before["rate_limiter"], after["rate_limiter"]
+    upstream_calls = limiter_after["admitted"] - limiter_before["admitted"]
+    queue_seconds = limiter_after["queue_wait_seconds"] - limiter_before["queue_wait_seconds"]
+
+    return {
+        "config": asdict(config),
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(records),
+        "errors": errors,
+        "error_rate": round(errors / len(records), 4) if records else 0.0,
+        "throughput_rps": round(len(records) / elapsed, 2) if elapsed else 0.0,
+        "outcomes": outcomes,
+        "latency": summarize_latencies([latency for _, latency, _ in records]),
+        "latency_by_kind": {
+            kind: summarize_latencies([latency for k, latency, _ in records if k == kind]) for kind in kinds
+        },
+        "upstream_calls": upstream_calls,
+        "queueing_delay": {
+            "mean_ms": round(queue_seconds / upstream_calls * 1000, 2) if upstream_calls else 0.0,
+            "max_ms": round(limiter_after["queue_wait_max_seconds"] * 1000, 2),
+        },
+        "server_stats": after,
+    }
+
+async def run_cancel_check(config: LoadTestConfig) -> dict:
+    """Cancel a streamed analysis that another session's identical /analyze was coalesced onto; the other must still succeed"""
+    code = SAMPLE_SNIPPETS[0] + f"\n# cancel check {time.time_ns()}"
+    async with open_client(config) as client:
+        before = (await client.get("/stats")).json()["deduplicated_requests"]
+        leader = asyncio.ensure_future(client.post(
+            "/analyze/stream", json={"code": code, "session_id": "loadtest_cancel_a", "is_followup": False}
+        ))
+        await asyncio.sleep(0.05)  # Let the stream become the leader
+        waiter = asyncio.ensure_future(client.post(
+            "/analyze", json={"code": code, "session_id": "loadtest_cancel_b", "is_followup": False}
+        ))
+        deadline = time.perf_counter() + config.timeout
+        while (await client.get("/stats")).json()["deduplicated_requests"] == before:
+            if waiter.done() or time.perf_counter() > deadline:
+                break
+            await asyncio.sleep(0.01)
+        coalesced = not waiter.done()
+        await client.post("/cancel/loadtest_cancel_a")
+        leader_outcome = classify_response(await leader)
+        waiter_outcome = classify_response(await waiter)
+    return {"coalesced": coalesced, "cancelled": leader_outcome, "waiter": waiter_outcome,
+            "passed": waiter_outcome == "ok"}
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("analyze", "chat"):
+            raise argparse.ArgumentTypeError(f"unknown request kind: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the ClippyAI server")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default={"analyze": 0.8, "chat": 0.2}, help="e.g. analyze=0.8,chat=0.2")
+    parser.add_argument("--backend", default="fake", help="backend for the in-process server (fake or gemini)")
+    parser.add_argument("--url", help="drive a running server instead, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--stream", action="store_true", help="use the SSE endpoints")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="share of repeated analyze inputs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--check-cancel", action="store_true",
+                        help="instead of a load test, check that cancelling one session spares coalesced requests")
+    args = parser.parse_args(argv)
+
+    if args.check_cancel:
+        results = asyncio.run(run_cancel_check(LoadTestConfig(backend=args.backend, url=args.url)))
+        print(f"{'✅' if results['passed'] else '❌'} Coalesced /analyze after cancelling its leader: {results['waiter']} "
+              f"(coalesced: {results['coalesced']}, cancelled stream: {results['cancelled']})")
+        return results
+
+    config = LoadTestConfig(
+        concurrency=args.concurrency, duration=args.duration, mix=args.mix, backend=args.backend,
+        url=args.url, stream=args.stream, repeat_ratio=args.repeat_ratio, seed=args.seed
+    )
+    results = asyncio.run(run_load_test(config))
+
+    latency = results["latency"]
+    print(f"📊 {results['requests']} requests in {results['elapsed_s']}s "
+          f"({results['throughput_rps']} req/s, error rate {results['error_rate']:.2%})")
+    print(f"   latency p50 {latency['p50_ms']}ms, p95 {latency['p95_ms']}ms, p99 {latency['p99_ms']}ms; "
+          f"queueing mean {results['queueing_delay']['mean_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    return results
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def load_test():
+        """Run the load generator against the in-process app: load_test(concurrency=..., duration=...)"""
+        return lambda **kwargs: asyncio.run(run_load_test(LoadTestConfig(**kwargs)))
+
+if __name__ == "__main__":
+    main()
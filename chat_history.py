@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Optional
@@ -17,8 +18,13 @@ class ConversationManager:
         self.sessions = {}  # session_id -> List[ChatMessage]
         self.current_session = None
     
-    def start_new_session(self, initial_code: str) -> str:
-        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}"
+    @staticmethod
+    def new_session_id() -> str:
+        return f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}"
+    
+    def start_new_session(self, initial_code: str, session_id: Optional[str] = None) -> str:
+        """Start and switch to a session; session_id is given when the request went out before the session existed"""
+        session_id = session_id or self.new_session_id()
         self.sessions[session_id] = [
             ChatMessage(
                 role="system",
@@ -51,15 +57,55 @@ class ConversationManager:
         )
         self.sessions[self.current_session].append(message)
     
-    def get_conversation_context(self, max_messages: int = 10) -> List[dict]:
+    def get_conversation_context(self, max_messages: Optional[int] = 10) -> List[dict]:
+        """Return the latest messages (all of them if max_messages is None)"""
         if not self.current_session:
             return []
         
-        messages = self.sessions[self.current_session][-max_messages:]
+        messages = self.sessions[self.current_session]
+        if max_messages is not None:
+            messages = messages[-max_messages:]
         return [
             {"role": msg.role, "content": msg.content} 
             for msg in messages
         ]
     
+    def message_count(self) -> int:
+        if not self.current_session:
+            return 0
+        return len(self.sessions[self.current_session])
+    
+    def resume_session(self, session_id: str) -> bool:
+        """Make an earlier session current again; False if it is unknown"""
+        if session_id not in self.sessions:
+            return False
+        self.current_session = session_id
+        return True
+    
     def clear_current_session(self):
         self.current_session = None
+
+@dataclass
+class RecentAnalysis:
+    session_id: str
+    explanation_html: str  # Rendered markdown, without the theme stylesheet
+    fixes_html: str
+
+class RecentAnalyses:
+    """Bounded LRU of recently analyzed clipboard digests, so a repeat copy can reopen its analysis offline"""
+
+    def __init__(self, max_entries: int = 20):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # clipboard digest -> RecentAnalysis
+
+    def get(self, digest: bytes) -> Optional[RecentAnalysis]:
+        entry = self.entries.get(digest)
+        if entry is not None:
+            self.entries.move_to_end(digest)
+        return entry
+
+    def put(self, digest: bytes, entry: RecentAnalysis) -> None:
+        self.entries[digest] = entry
+        self.entries.move_to_end(digest)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
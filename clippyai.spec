@@ -12,6 +12,8 @@ a = Analysis(
         ('ui', 'ui'),
         ('api_key_manager.py', '.'),
         ('chat_history.py', '.'),  # Added for conversational memory
+        ('transport.py', '.'),  # GUI <-> analysis engine transports
+        ('workers.py', '.'),  # Background request workers with cancel tokens
         ('resources_rc.py', '.'),  # Added for embedded icon resource
         ('icon.ico', '.'),
     ],
@@ -49,7 +51,6 @@ a = Analysis(
         'markdown.extensions.fenced_code',
         'requests',
         'dotenv',
-        'pyperclip',
         
         # PyQt5
         'PyQt5.QtCore',
@@ -15,22 +15,54 @@ if getattr(sys, 'frozen', False):
     # sys.stdout = open(log_file, 'w')
     # sys.stderr = sys.stdout
     
-import pyperclip
-import requests
-import markdown
 import threading
-import time
+from collections import deque
 from PyQt5.QtWidgets import QApplication, QMessageBox
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import QByteArray, QCryptographicHash, QTimer
 from PyQt5.QtGui import QIcon
 from ui.window import FloatingWindow
 from ui.prompt import PromptWindow, AdditionalInfoPromptWindow
 from api_key_manager import APIKeyManager, APIKeyDialog
-from chat_history import ConversationManager
+from chat_history import ConversationManager, RecentAnalyses, RecentAnalysis
+from workers import StreamWorker
+from api.classifier import CODE_PATTERNS, is_programming_question
+from transport import SERVER_HOST, SERVER_PORT, SessionOutOfSync, bind_socket, create_transport
 import resources_rc  # Import the compiled resource file
 
-API_URL = "http://127.0.0.1:8000/analyze"
-CHAT_URL = "http://127.0.0.1:8000/chat"
+# How long the GUI waits for the server's startup signal
+SERVER_STARTUP_TIMEOUT = 15
+
+# Set by start_server if uvicorn stops before or during startup, or the server can't be imported
+server_error = None
+# Set by start_server once the server is up or has failed; wait_for_server blocks on it
+server_ready = threading.Event()
+
+# "inprocess" calls the analysis engine directly, "http" talks to a uvicorn server over loopback
+TRANSPORT = os.getenv("CLIPPY_TRANSPORT", "inprocess")
+
+# With the in-process transport, also serve the HTTP API for external clients
+SERVE_HTTP = os.getenv("CLIPPY_SERVE_HTTP", "0") == "1"
+
+# With the http transport, use this (e.g. shared remote) server instead of starting one locally
+SERVER_URL = os.getenv("CLIPPY_SERVER_URL", "")
+
+# HTTP client timeouts in seconds; the read timeout applies between streamed chunks
+CONNECT_TIMEOUT = float(os.getenv("CLIPPY_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("CLIPPY_READ_TIMEOUT", "30"))
+
+# Clipboard changes are handled once they settle for this long (apps often set the clipboard several times per copy)
+CLIPBOARD_DEBOUNCE_MS = int(os.getenv("CLIPPY_CLIPBOARD_DEBOUNCE_MS", "150"))
+
+# Larger clipboard text (e.g. a copied log file) is ignored without being read into Python
+MAX_CLIPBOARD_BYTES = int(os.getenv("CLIPPY_MAX_CLIPBOARD_BYTES", str(2 * 1024 * 1024)))
+
+# Recent analyses kept by clipboard digest; copying one of them again offers to reopen it offline
+RECENT_ANALYSES = int(os.getenv("CLIPPY_RECENT_ANALYSES", "20"))
+
+# Opt-in: start analyzing a copy while the permission prompt is still shown, at most this many at once
+SPECULATIVE = os.getenv("CLIPPY_SPECULATIVE", "0") == "1"
+MAX_SPECULATIVE = int(os.getenv("CLIPPY_MAX_SPECULATIVE", "1"))
+SPECULATIVE_MIN_CHARS = int(os.getenv("CLIPPY_SPECULATIVE_MIN_CHARS", "20"))
 
 # ✅ Updated theme-specific HTML styling with larger fonts
 LIGHT_MODE_STYLE = """
@@ -89,32 +121,98 @@ p, li, div {
 </style>
 """
 
+def render_markdown(text):
+    """Markdown to HTML; markdown is imported on first use (normally already loaded by warm_up)"""
+    import markdown
+    return markdown.markdown(text, extensions=["fenced_code"])
+
+def worth_speculating(text):
+    """Cheap filter so copied URLs, single words and prose don't start a paid call"""
+    text = text.strip()
+    if len(text) < SPECULATIVE_MIN_CHARS or len(text.split(None, 1)) < 2:
+        return False  # Short, or one token such as a URL or a path
+    return sum(1 for pattern in CODE_PATTERNS if pattern in text) >= 3 or is_programming_question(text)
+
+class Speculation:
+    """An analysis started before the user asked for it; its signals are held until it is revealed"""
+
+    def __init__(self, worker, session_id, digest):
+        self.worker = worker
+        self.token = worker.token
+        self.session_id = session_id
+        self.digest = digest
+        self.pending = []  # (kind, args) signals received before the reveal
+        self.failed = False  # Re-issue instead of revealing an error
+        self.revealed = False
+
 class ClipboardWatcher:
-    def __init__(self, window):
+    def __init__(self, window, transport):
         self.window = window
-        self.last_clipboard = ""
+        self.transport = transport
+        self.last_digest = None  # SHA-1 of the last clipboard text handled
+        self.current_digest = None  # SHA-1 of current_copied_text
+        self.recent = RecentAnalyses(RECENT_ANALYSES)
         self.current_copied_text = ""
         self.current_session_id = None
+        
+        # Requests in flight; each worker runs on the thread pool with its own cancel token
+        self.analysis_token = None
+        self.analysis_worker = None
+        self.analysis_digest = None  # Clipboard digest the analysis in flight is for
+        self.streamed_md = {"explanation": "", "fixes": ""}
+        self.local_findings_md = ""
+        self.chat_token = None
+        self.chat_worker = None
+        self.chat_queue = deque()  # Messages typed while a reply is still streaming
+        self.streamed_chat_md = ""
+        self.speculation = None  # Speculative analysis of current_copied_text, if any
+        self.speculating = 0  # Speculative workers still running, including cancelled ones
 
         # Set up the callback for chat responses
         self.window.get_chat_response_callback = self.get_chat_response
+        self.window.window_closed_callback = self.cancel_all
 
-        self.timer = QTimer()
-        self.timer.setInterval(1000)
-        self.timer.timeout.connect(self.check_clipboard)
-        self.timer.start()
+        # Woken by the clipboard itself instead of polling it
+        self.debounce = QTimer()
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(CLIPBOARD_DEBOUNCE_MS)
+        self.debounce.timeout.connect(self.check_clipboard)
+        self.clipboard = QApplication.clipboard()
+        self.clipboard.dataChanged.connect(self.debounce.start)
+        self.debounce.start()  # Text already on the clipboard at startup counts as a copy
 
     def check_clipboard(self):
-        current = pyperclip.paste()
-        if current != self.last_clipboard and current.strip():
-            self.last_clipboard = current
+        mime = self.clipboard.mimeData()
+        if mime is None or not mime.hasText():
+            return
+        # Size and digest are computed on Qt's copy of the data; the text is only read when it changed
+        data = mime.data("text/plain")
+        if data.isEmpty():
+            data = QByteArray(mime.text().encode("utf-8"))  # Text offered only under another MIME type
+        if data.size() > MAX_CLIPBOARD_BYTES:
+            print(f"📋 Ignoring clipboard text of {data.size()} bytes (limit {MAX_CLIPBOARD_BYTES})")
+            return
+        digest = bytes(QCryptographicHash.hash(data, QCryptographicHash.Sha1))
+        if digest == self.last_digest:
+            return
+        self.last_digest = digest
+        current = mime.text()
+        if current.strip():
             self.current_copied_text = current
+            self.current_digest = digest
+            # The analysis in flight is for the previous copy
+            self.cancel_analysis()
+            self.cancel_speculation()
             self.ask_permission(current)
+            if SPECULATIVE and self.recent.get(digest) is None and worth_speculating(current):
+                self.start_speculation()
 
     def ask_permission(self, copied_text):
+        previous = self.recent.get(self.current_digest)
         self.prompt = PromptWindow(
             on_yes=lambda: self.show_additional_info_prompt(),
-            on_no=lambda: None
+            on_no=lambda: self.cancel_speculation(),
+            on_reopen=(lambda: self.reopen_analysis(previous)) if previous else None
         )
         self.prompt.show()
 
@@ -127,88 +225,310 @@ class ClipboardWatcher:
 
     def analyze_code_with_additional_info(self, additional_info):
         """Enhanced to start a conversation session"""
-        try:
-            print(f"📡 Sending request to: {API_URL}")
-            
-            # Start new conversation session
-            self.current_session_id = self.window.conversation_manager.start_new_session(
-                self.current_copied_text + (f"\n\nAdditional Context: {additional_info}" if additional_info else "")
+        # A newer analysis replaces the one in flight
+        self.cancel_analysis()
+        
+        # Additional context changes the prompt, so a speculative result only fits without it
+        speculation = self.speculation
+        self.speculation = None
+        if speculation is not None and not additional_info and not speculation.failed:
+            self.reveal_speculation(speculation)
+            return
+        if speculation is not None:
+            speculation.token.cancel()
+        
+        # Start new conversation session
+        self.current_session_id = self.window.conversation_manager.start_new_session(
+            self.current_copied_text + (f"\n\nAdditional Context: {additional_info}" if additional_info else "")
+        )
+        
+        # Combine original text with additional info
+        combined_input = self.current_copied_text
+        if additional_info:
+            combined_input += f"\n\nAdditional Context: {additional_info}"
+        
+        payload = {
+            "code": combined_input,
+            "session_id": self.current_session_id,
+            "is_followup": False
+        }
+        
+        # Send initial analysis request on a worker; chunks are rendered as they arrive
+        worker = StreamWorker(lambda token: self.transport.analyze_stream(payload, token))
+        token = worker.token
+        self.analysis_token = token
+        self.analysis_worker = worker
+        self.analysis_digest = self.current_digest
+        self.streamed_md = {"explanation": "", "fixes": ""}
+        self.local_findings_md = ""
+        worker.signals.event.connect(lambda event, data: self.on_analysis_event(token, event, data))
+        worker.signals.failed.connect(lambda error: self.on_analysis_failed(token, error))
+        worker.signals.finished.connect(lambda: self.on_analysis_finished(token))
+        
+        self.window.set_status("⏳ Analyzing...")
+        self.window.show()
+        worker.start()
+
+    def on_analysis_event(self, token, event, payload):
+        if token is not self.analysis_token:
+            return  # Superseded by a newer analysis
+        
+        if event == "progress":
+            # Large pastes are reviewed in chunks before the merged analysis streams in
+            if payload["stage"] == "map":
+                self.window.set_status(f"⏳ Reviewing part {payload['done']}/{payload['total']}...")
+            else:
+                self.window.set_status(f"⏳ Merging {payload['total']} parts...")
+            return
+        
+        theme_style = self.window.current_theme_style()
+        if event == "findings":
+            # Local checks finish long before the model's first token
+            self.local_findings_md = payload["markdown"]
+        if event in ("delta", "findings"):
+            if event == "delta":
+                self.streamed_md[payload["channel"]] += payload["text"]
+            self.window.update_content(
+                theme_style + render_markdown(self.streamed_md["explanation"]),
+                theme_style + render_markdown(self.with_local_findings(self.streamed_md["fixes"]))
             )
-            
-            # Combine original text with additional info
-            combined_input = self.current_copied_text
-            if additional_info:
-                combined_input += f"\n\nAdditional Context: {additional_info}"
-            
-            # Send initial analysis request
-            res = requests.post(API_URL, json={
-                "code": combined_input,
-                "session_id": self.current_session_id,
-                "is_followup": False
-            }, timeout=30)
-            
-            print(f"✅ API Response status: {res.status_code}")
-            data = res.json()
-            explanation_md = data.get("explanation", "No explanation returned.")
-            fixes_md = data.get("fixes", "No fixes returned.")
-            
-            # Add AI response to conversation
-            self.window.conversation_manager.add_message("assistant", explanation_md + "\n\n" + fixes_md)
-            
-            # Display results
-            theme_style = self.window.current_theme_style()
-            explanation_html = theme_style + markdown.markdown(explanation_md, extensions=["fenced_code"])
-            fixes_html = theme_style + markdown.markdown(fixes_md, extensions=["fenced_code"])
-            
-            self.window.update_content(explanation_html, fixes_html)
-            
-            # Initialize chat with welcome message
-            self.window.add_chat_message("ClippyAI", "Analysis complete! 🎉\n\nFeel free to:\n• Report any LeetCode errors\n• Ask for improvements\n• Request explanations\n• Debug issues", "#2196F3")
-            
-            self.window.show()
-            
-        except Exception as e:
-            print(f"❌ API Error: {e}")
-            error_html = f"<b>Error contacting API.</b><br><pre>{str(e)}</pre>"
-            self.window.update_content(error_html, "")
-            self.window.show()
+            return
+        
+        explanation_md = payload.get("explanation", "No explanation returned.")
+        fixes_md = payload.get("fixes", "No fixes returned.")
+        
+        # Add AI response to conversation
+        self.window.conversation_manager.add_message("assistant", explanation_md + "\n\n" + fixes_md)
+        
+        # Display results
+        explanation_html = render_markdown(explanation_md)
+        fixes_html = render_markdown(self.with_local_findings(fixes_md))
+        if event == "done":
+            self.recent.put(self.analysis_digest, RecentAnalysis(self.current_session_id, explanation_html, fixes_html))
+        
+        self.window.update_content(theme_style + explanation_html, theme_style + fixes_html)
+        
+        # Initialize chat with welcome message
+        self.window.add_chat_message("ClippyAI", "Analysis complete! 🎉\n\nFeel free to:\n• Report any LeetCode errors\n• Ask for improvements\n• Request explanations\n• Debug issues", "#2196F3")
+        
+        self.window.show()
 
-    def get_chat_response(self):
-        """Get AI response for chat message"""
+    def with_local_findings(self, fixes_md):
+        """Local check findings stay above the model's fixes"""
+        if not self.local_findings_md:
+            return fixes_md
+        return self.local_findings_md + "\n\n" + fixes_md
+
+    def on_analysis_failed(self, token, error):
+        if token is not self.analysis_token:
+            return
+        print(f"❌ API Error: {error}")
+        error_html = f"<b>Error contacting API.</b><br><pre>{str(error)}</pre>"
+        self.window.update_content(error_html, "")
+        self.window.show()
+
+    def on_analysis_finished(self, token):
+        if token is not self.analysis_token:
+            return
+        self.analysis_token = None
+        self.analysis_worker = None
+        self.update_status()
+
+    def reopen_analysis(self, entry):
+        """Show an earlier analysis and its chat again, without any network call"""
+        self.cancel_speculation()
+        self.cancel_all()
+        manager = self.window.conversation_manager
+        if not manager.resume_session(entry.session_id):
+            return
+        self.current_session_id = entry.session_id
+        
+        theme_style = self.window.current_theme_style()
+        self.window.update_content(theme_style + entry.explanation_html, theme_style + entry.fixes_html)
+        
+        # Replay the chat: skip the system message, the code and the analysis itself
+        self.window.chat_history.clear()
+        for message in manager.sessions[entry.session_id][3:]:
+            if message.role == "user":
+                self.window.add_chat_message("You", message.content, "#4CAF50")
+            elif message.role == "assistant":
+                self.window.add_chat_message("ClippyAI", render_markdown(message.content), "#2196F3")
+        self.window.add_chat_message("ClippyAI", "Reopened your previous analysis. Ask away to continue the conversation.", "#2196F3")
+        self.window.show()
+
+    def get_chat_response(self, message):
+        """Queue a chat message; it is sent once the reply in flight (if any) has finished"""
         if not self.current_session_id:
+            self.window.add_chat_message("You", message, "#4CAF50")
             self.window.add_chat_message("ClippyAI", "Please start by copying some code first!", "#f44336")
             return
-            
-        try:
-            # Get conversation context
-            context = self.window.conversation_manager.get_conversation_context()
-            
-            # Get the last user message
-            last_message = context[-1]["content"] if context else ""
-            
-            print(f"💬 Sending chat request to: {CHAT_URL}")
-            
-            res = requests.post(CHAT_URL, json={
-                "code": last_message,
-                "session_id": self.current_session_id,
-                "is_followup": True,
-                "conversation_context": context
-            }, timeout=30)
-            
-            print(f"✅ Chat Response status: {res.status_code}")
-            data = res.json()
-            ai_response = data.get("chat_response", "Sorry, I couldn't process that.")
-            
-            # Add AI response to conversation manager
-            self.window.conversation_manager.add_message("assistant", ai_response)
-            
-            # Display in chat with markdown formatting
-            formatted_response = markdown.markdown(ai_response, extensions=["fenced_code"])
-            self.window.add_chat_message("ClippyAI", formatted_response, "#2196F3")
-            
-        except Exception as e:
-            print(f"❌ Chat Error: {e}")
-            self.window.add_chat_message("ClippyAI", f"Error: {str(e)}", "#f44336")
+        
+        self.chat_queue.append(message)
+        if self.chat_token is None:
+            self.send_next_chat_message()
+        else:
+            self.update_status()
+
+    def send_next_chat_message(self):
+        """Start the reply to the oldest queued chat message"""
+        if not self.chat_queue:
+            self.update_status()
+            return
+        
+        message = self.chat_queue.popleft()
+        manager = self.window.conversation_manager
+        
+        # Shown and recorded only now, so the history stays in question/answer order
+        self.window.add_chat_message("You", message, "#4CAF50")
+        manager.add_message("user", message)
+        
+        # The server keeps the history: send only the new message and our sequence number
+        payload = {
+            "code": message,
+            "session_id": self.current_session_id,
+            "is_followup": True,
+            "seq": manager.message_count() - 1
+        }
+        # Snapshot for a resync, taken here because the worker must not read the manager
+        full_context = manager.get_conversation_context(max_messages=None)
+        
+        def open_stream(token):
+            try:
+                return self.transport.chat_stream(payload, token)
+            except SessionOutOfSync:
+                # Server lost or diverged from our history: resync with the full context
+                print("🔄 Chat session out of sync, resending full history")
+                return self.transport.chat_stream({**payload, "conversation_context": full_context}, token)
+        
+        worker = StreamWorker(open_stream)
+        token = worker.token
+        self.chat_token = token
+        self.chat_worker = worker
+        self.streamed_chat_md = ""
+        worker.signals.event.connect(lambda event, data: self.on_chat_event(token, event, data))
+        worker.signals.failed.connect(lambda error: self.on_chat_failed(token, error))
+        worker.signals.finished.connect(lambda: self.on_chat_finished(token))
+        
+        self.window.begin_chat_stream()
+        self.update_status()
+        worker.start()
+
+    def on_chat_event(self, token, event, payload):
+        if token is not self.chat_token:
+            return
+        
+        if event == "delta":
+            self.streamed_chat_md += payload["text"]
+            formatted_partial = render_markdown(self.streamed_chat_md)
+            self.window.update_chat_stream("ClippyAI", formatted_partial, "#2196F3")
+            return
+        
+        ai_response = payload.get("chat_response", "Sorry, I couldn't process that.")
+        
+        # Add AI response to conversation manager
+        self.window.conversation_manager.add_message("assistant", ai_response)
+        
+        # Display in chat with markdown formatting
+        formatted_response = render_markdown(ai_response)
+        self.window.update_chat_stream("ClippyAI", formatted_response, "#2196F3")
+        self.window.end_chat_stream()
+
+    def on_chat_failed(self, token, error):
+        if token is not self.chat_token:
+            return
+        print(f"❌ Chat Error: {error}")
+        self.window.end_chat_stream()
+        self.window.add_chat_message("ClippyAI", f"Error: {str(error)}", "#f44336")
+
+    def on_chat_finished(self, token):
+        if token is not self.chat_token:
+            return
+        self.window.end_chat_stream()
+        self.chat_token = None
+        self.chat_worker = None
+        self.send_next_chat_message()
+
+    def start_speculation(self):
+        """Analyze current_copied_text in the background while the permission prompt is shown"""
+        if self.speculating >= MAX_SPECULATIVE:
+            return
+        
+        session_id = ConversationManager.new_session_id()
+        payload = {"code": self.current_copied_text, "session_id": session_id, "is_followup": False}
+        worker = StreamWorker(lambda token: self.transport.analyze_stream(payload, token))
+        speculation = Speculation(worker, session_id, self.current_digest)
+        self.speculation = speculation
+        self.speculating += 1
+        worker.signals.event.connect(lambda event, data: self.on_speculation_signal(speculation, "event", (event, data)))
+        worker.signals.failed.connect(lambda error: self.on_speculation_signal(speculation, "failed", (error,)))
+        worker.signals.finished.connect(lambda: self.on_speculation_signal(speculation, "finished", ()))
+        worker.signals.finished.connect(self.on_speculation_finished)
+        worker.start()
+
+    def on_speculation_signal(self, speculation, kind, args):
+        if speculation.revealed:
+            getattr(self, f"on_analysis_{kind}")(speculation.token, *args)
+            return
+        if kind == "failed" or (kind == "event" and args[0] == "error"):
+            speculation.failed = True
+        speculation.pending.append((kind, args))
+
+    def on_speculation_finished(self):
+        self.speculating -= 1
+
+    def reveal_speculation(self, speculation):
+        """Adopt a speculative analysis as the current one and replay what it has received so far"""
+        self.current_session_id = self.window.conversation_manager.start_new_session(
+            self.current_copied_text, session_id=speculation.session_id
+        )
+        self.analysis_token = speculation.token
+        self.analysis_worker = speculation.worker
+        self.analysis_digest = speculation.digest
+        self.streamed_md = {"explanation": "", "fixes": ""}
+        self.local_findings_md = ""
+        speculation.revealed = True
+        
+        self.window.set_status("⏳ Analyzing...")
+        self.window.show()
+        for kind, args in speculation.pending:
+            getattr(self, f"on_analysis_{kind}")(speculation.token, *args)
+        speculation.pending.clear()
+
+    def cancel_speculation(self):
+        if self.speculation is not None:
+            self.speculation.token.cancel()
+            self.speculation = None
+
+    def cancel_analysis(self):
+        """Abort the analysis in flight; the transport tells the engine to stop its upstream call"""
+        if self.analysis_token is None:
+            return
+        self.analysis_token.cancel()
+        self.analysis_token = None
+        self.analysis_worker = None
+        self.update_status()
+
+    def cancel_all(self):
+        """Abort the analysis and chat reply in flight and drop queued chat messages (window closed)"""
+        self.cancel_analysis()
+        self.chat_queue.clear()
+        if self.chat_token is not None:
+            self.chat_token.cancel()
+            self.chat_token = None
+            self.chat_worker = None
+            self.window.end_chat_stream()
+        self.update_status()
+
+    def update_status(self):
+        """Show what is in flight in the window's status label"""
+        parts = []
+        if self.analysis_token is not None:
+            parts.append("⏳ Analyzing...")
+        if self.chat_token is not None:
+            parts.append("💬 Replying...")
+        if self.chat_queue:
+            parts.append(f"📝 {len(self.chat_queue)} queued")
+        self.window.set_status("  ".join(parts))
 
     # Keep the original analyze_code method as backup (not used now)
     def analyze_code(self, code):
@@ -217,31 +537,78 @@ class ClipboardWatcher:
         # Keeping it for backward compatibility
         self.analyze_code_with_additional_info("")
 
-def start_server():
-    """Start the FastAPI server in a separate thread"""
+def export_api_key():
+    """Make the stored API key visible to the analysis engine. Returns False if there is none."""
+    gemini_key = APIKeyManager.load_api_key()
+    if not gemini_key:
+        print("❌ No API key found!")
+        return False
+    
+    # Set environment variable for the server
+    os.environ["GEMINI_API_KEY"] = gemini_key
+    print(f"✅ GEMINI_API_KEY loaded from registry: {gemini_key[:10]}...")
+    return True
+
+def start_server(sock):
+    """Run the FastAPI server on an already bound socket (in a separate thread)"""
+    global server_error
     print("🚀 Starting FastAPI server...")
     
     try:
-        # Get API key from registry
-        gemini_key = APIKeyManager.load_api_key()
-        if not gemini_key:
-            print("❌ No API key found!")
-            return
-        
-        # Set environment variable for the server
-        os.environ["GEMINI_API_KEY"] = gemini_key
-        print(f"✅ GEMINI_API_KEY loaded from registry: {gemini_key[:10]}...")
-        
         import uvicorn
-        from api.server import app
-        
-        print("🌐 Starting uvicorn server on 127.0.0.1:8000...")
-        uvicorn.run(app, host="127.0.0.1", port=8000, log_level="error")
+        from api import server
+
+        class Server(uvicorn.Server):
+            async def startup(self, sockets=None):
+                await super().startup(sockets=sockets)
+                if not self.should_exit:
+                    server_ready.set()  # The app's lifespan has run; requests can be served
+
+        print(f"🌐 Starting uvicorn server on {SERVER_HOST}:{SERVER_PORT}...")
+        uvicorn_server = Server(uvicorn.Config(server.app, log_level="error"))
+        uvicorn_server.run(sockets=[sock])
+        if not uvicorn_server.started:
+            server_error = RuntimeError("Server stopped during startup")
         
-    except Exception as e:
-        print(f"❌ Server failed to start: {e}")
+    except BaseException as e:
+        # uvicorn reports startup failures with sys.exit
+        server_error = e if isinstance(e, Exception) else RuntimeError(f"Server exited during startup ({e!r})")
+        sock.close()
+        print(f"❌ Server failed to start: {server_error}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Wake wait_for_server if startup never finished
+        server_ready.set()
+
+def wait_for_server():
+    """Block until the server signals startup (or fails), up to SERVER_STARTUP_TIMEOUT seconds"""
+    if not server_ready.wait(SERVER_STARTUP_TIMEOUT):
+        print(f"❌ Server failed to start after {SERVER_STARTUP_TIMEOUT} seconds")
+        return False
+    if server_error is not None:
+        # start_server already reported it
+        return False
+    print("✅ Server is ready!")
+    return True
+
+def warm_up(transport, server_started):
+    """Import heavy modules and start the analysis engine off the GUI thread"""
+    render_markdown("")  # markdown and its fenced_code extension
+    
+    if TRANSPORT == "inprocess":
+        # Analysis engine runs in this process; no loopback server unless CLIPPY_SERVE_HTTP=1
+        print("🧠 Starting in-process analysis engine...")
+        try:
+            transport.start()
+            print("✅ Analysis engine is ready!")
+        except Exception as e:
+            print(f"❌ Analysis engine failed to start: {e}")
+    elif server_started:
+        # Wait for server
+        print("⏳ Waiting for server to start...")
+        if not wait_for_server():
+            print("⚠️ Server may not be ready, requests will fail until it is")
 
 def setup_api_key():
     """Handle API key setup on first run or when missing"""
@@ -262,21 +629,6 @@ def setup_api_key():
     
     return api_key
 
-def test_server_connection():
-    """Test if server is responding"""
-    max_attempts = 15
-    for i in range(max_attempts):
-        try:
-            response = requests.get("http://127.0.0.1:8000", timeout=2)
-            print("✅ Server is responding!")
-            return True
-        except requests.exceptions.RequestException:
-            print(f"⏳ Server not ready yet... ({i+1}/{max_attempts})")
-            time.sleep(1)
-    
-    print("❌ Server failed to start after 15 seconds")
-    return False
-
 def set_application_icon(app):
     """Set the application icon globally from embedded resource"""
     try:
@@ -303,6 +655,11 @@ def set_application_icon(app):
         print(f"❌ Error setting application icon: {e}")
 
 if __name__ == "__main__":
+    import multiprocessing
+    
+    # The engine's local checks run in a spawned worker process; a frozen build must not start the GUI there
+    multiprocessing.freeze_support()
+    
     print("🎯 Starting ClippyAI application...")
     
     # Setup API key first
@@ -310,17 +667,24 @@ if __name__ == "__main__":
     if not api_key:
         sys.exit(1)
     
-    # Start server thread
-    print("🧵 Creating server thread...")
-    server_thread = threading.Thread(target=start_server, daemon=True)
-    server_thread.start()
-    
-    # Wait for server
-    print("⏳ Waiting for server to start...")
-    server_ready = test_server_connection()
-    
-    if not server_ready:
-        print("⚠️ Server may not be ready, but continuing with GUI...")
+    transport = create_transport(
+        TRANSPORT, serve_http=SERVE_HTTP, base_url=SERVER_URL,
+        connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT
+    )
+    export_api_key()
+    server_started = False
+    if TRANSPORT == "http" and not SERVER_URL:
+        try:
+            # Bind here so a busy port is reported now; requests queue on the socket until the server is up
+            sock = bind_socket(SERVER_HOST, SERVER_PORT)
+        except OSError as e:
+            print(f"❌ Cannot listen on {SERVER_HOST}:{SERVER_PORT}: {e}")
+        else:
+            # Start server thread
+            print("🧵 Creating server thread...")
+            server_thread = threading.Thread(target=start_server, args=(sock,), daemon=True)
+            server_thread.start()
+            server_started = True
     
     try:
         print("🖥️ Starting PyQt5 application...")
@@ -342,8 +706,12 @@ if __name__ == "__main__":
         # Add API key settings to window
         window.api_key_manager = APIKeyManager
         
-        watcher = ClipboardWatcher(window)
+        watcher = ClipboardWatcher(window, transport)
+        app.aboutToQuit.connect(transport.close)
         print("✅ GUI started successfully")
+        
+        # Heavy modules and the analysis engine load once the GUI is up
+        threading.Thread(target=warm_up, args=(transport, server_started), daemon=True).start()
         sys.exit(app.exec_())
     except Exception as e:
         print(f"❌ Application error: {e}")
@@ -0,0 +1,286 @@
+import gzip
+import json
+import os
+import socket
+import threading
+
+# asyncio and requests are imported where they are used, to keep GUI startup fast
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+
+class SessionOutOfSync(Exception):
+    """The server lost or diverged from the chat history; resend the full conversation_context"""
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Bind and listen up front, so a busy port fails in the caller instead of inside a server thread"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if os.name != "nt":
+        # On Windows SO_REUSEADDR would let us bind a port that is already in use
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind((host, port))
+        sock.listen(128)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def busy_message(status_code, retry_after) -> str:
+    return f"Server is busy (HTTP {status_code}), please retry in {retry_after} seconds"
+
+def iter_sse_events(response):
+    """Parse a text/event-stream response into (event, data) pairs"""
+    event, data_lines = "message", []
+    finished = False
+    try:
+        for raw_line in response.iter_lines():
+            line = raw_line.decode("utf-8")
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+            elif not line and data_lines:
+                finished = event in ("done", "error")
+                yield event, json.loads("\n".join(data_lines))
+                event, data_lines = "message", []
+    finally:
+        if finished:
+            # Only the end of the body is left: read it so the connection can be reused
+            response.raw.drain_conn()
+        response.close()
+
+def raise_if_busy(response):
+    """Turn the server's rate-limit responses into a readable error"""
+    if response.status_code in (429, 503):
+        raise RuntimeError(busy_message(response.status_code, response.headers.get("Retry-After", "a few")))
+
+class HttpTransport:
+    """Talks to the FastAPI server over HTTP (local or remote) through one pooled keep-alive session"""
+
+    def __init__(self, base_url: str = f"http://{SERVER_HOST}:{SERVER_PORT}", connect_timeout: float = 5,
+                 read_timeout: float = 30, pool_size: int = 4, connect_retries: int = 2,
+                 gzip_min_bytes: int = 16 * 1024):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)  # read_timeout is per chunk, not for the whole stream
+        self.pool_size = pool_size
+        self.connect_retries = connect_retries
+        self.gzip_min_bytes = gzip_min_bytes  # Compress request bodies at least this large
+        self.session = None
+        self.lock = threading.Lock()
+
+    def _get_session(self):
+        with self.lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                # POSTs aren't idempotent: retry failed connects, never a request that reached the server
+                retry = Retry(total=self.connect_retries, connect=self.connect_retries, read=0, status=0,
+                              backoff_factor=0.2, raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.session = session
+            return self.session
+
+    def analyze_stream(self, payload: dict, token=None):
+        """(event, data) pairs for an analysis; same payload as POST /analyze/stream"""
+        return self._stream("/analyze/stream", payload, token)
+
+    def chat_stream(self, payload: dict, token=None):
+        """(event, data) pairs for a chat turn; same payload as POST /chat/stream"""
+        return self._stream("/chat/stream", payload, token)
+
+    def cancel(self, session_id: str):
+        """Ask the server to stop a session's upstream calls, without blocking the caller"""
+        from urllib.parse import quote
+
+        url = f"{self.base_url}/cancel/{quote(session_id, safe='')}"
+
+        def post():
+            try:
+                self._get_session().post(url, timeout=(self.timeout[0], 5)).close()
+            except Exception as e:
+                print(f"⚠️ Cancel request failed: {e}")
+
+        threading.Thread(target=post, name="clippy-cancel", daemon=True).start()
+
+    def close(self):
+        with self.lock:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
+
+    def _stream(self, path: str, payload: dict, token=None):
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if len(body) >= self.gzip_min_bytes:
+            # Large pastes compress well and matter most over a real network
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+
+        print(f"📡 Sending request to: {self.base_url + path}")
+        res = self._get_session().post(self.base_url + path, data=body, headers=headers, timeout=self.timeout, stream=True)
+        print(f"✅ API Response status: {res.status_code}")
+        if res.status_code in (409, 429, 503):
+            # Error bodies are small: reading them returns the connection to the pool
+            detail = res.text
+            if res.status_code == 409:
+                raise SessionOutOfSync(detail)
+            raise_if_busy(res)
+        if res.status_code != 200:
+            # e.g. 413/400 from the gzip middleware, 422 or 500: the body is an error, not an event stream
+            detail = res.text
+            try:
+                detail = res.json().get("detail", detail)
+            except (ValueError, AttributeError):
+                pass
+            raise RuntimeError(f"Server error {res.status_code}: {detail}")
+        if token is not None and payload.get("session_id"):
+            # The server ends the stream once its upstream call is stopped, which unblocks our read
+            token.on_cancel(lambda: self.cancel(payload["session_id"]))
+        return iter_sse_events(res)
+
+class InProcessTransport:
+    """Runs the analysis engine on a private event loop in this process: no sockets, no JSON"""
+
+    def __init__(self, serve_http: bool = False, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                 startup_timeout: float = 30):
+        self.serve_http = serve_http  # Also expose the HTTP API for external clients
+        self.host = host
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.loop = None
+        self.lifespan = None
+        self.http_server = None
+        self.started = threading.Event()  # Set when start() finishes, successfully or not
+        self.start_error = None
+
+    def start(self):
+        """Start the engine's event loop thread and run the server's startup hook on it (may run in a background thread)"""
+        import asyncio
+
+        try:
+            sock = None
+            if self.serve_http:
+                try:
+                    sock = bind_socket(self.host, self.port)
+                except OSError as e:
+                    print(f"❌ Cannot serve the HTTP API on {self.host}:{self.port}: {e}")
+                    self.serve_http = False
+
+            from api import server
+
+            self.server = server
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, name="clippy-engine", daemon=True).start()
+            self._call(self._startup(sock), self.startup_timeout)
+        except Exception as e:
+            self.start_error = e
+            raise
+        finally:
+            self.started.set()
+
+    async def _startup(self, sock):
+        import asyncio
+
+        self.lifespan = self.server.lifespan(self.server.app)
+        await self.lifespan.__aenter__()
+        if self.serve_http:
+            import uvicorn
+
+            # Same loop and app.state as the GUI; the lifespan above already ran
+            config = uvicorn.Config(self.server.app, host=self.host, port=self.port, log_level="error", lifespan="off")
+            self.http_server = uvicorn.Server(config)
+            asyncio.ensure_future(self.http_server.serve(sockets=[sock]))
+
+    def analyze_stream(self, payload: dict, token=None):
+        """(event, data) pairs for an analysis; same payload as POST /analyze/stream"""
+        return self._stream("open_analysis_stream", payload, token)
+
+    def chat_stream(self, payload: dict, token=None):
+        """(event, data) pairs for a chat turn; same payload as POST /chat/stream"""
+        return self._stream("open_chat_stream", payload, token)
+
+    def close(self):
+        if self.loop is None:
+            return
+        if self.http_server is not None:
+            self.http_server.should_exit = True
+        if self.lifespan is not None:
+            self._call(self.lifespan.__aexit__(None, None, None), 10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _call(self, coro, timeout: float = None):
+        """Run a coroutine on the engine loop and wait for its result"""
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def _stream(self, opener: str, payload: dict, token=None):
+        # The engine may still be warming up in the background
+        if not self.started.wait(self.startup_timeout):
+            raise RuntimeError("Analysis engine is still starting, please retry")
+        if self.start_error is not None:
+            raise RuntimeError(f"Analysis engine failed to start: {self.start_error}")
+
+        from fastapi import HTTPException
+
+        open_stream = getattr(self.server, opener)
+        input = self.server.CodeInput(**payload)
+
+        async def open_events():
+            return open_stream(input)
+
+        try:
+            events = self._call(open_events())
+        except HTTPException as e:
+            if e.status_code == 409:
+                raise SessionOutOfSync(str(e.detail)) from e
+            raise
+        except self.server.RateLimitExceeded as e:
+            raise RuntimeError(busy_message(e.status_code, e.retry_after)) from e
+        return self._iterate(events, token)
+
+    def _iterate(self, events, token=None):
+        import asyncio
+
+        done = object()
+        current = {}
+
+        async def step():
+            current["task"] = asyncio.current_task()
+            try:
+                return await events.__anext__()
+            except StopAsyncIteration:
+                return done
+
+        def abort():
+            # Cancelling the engine-side task stops the upstream call (or its wait for quota) at once
+            task = current.get("task")
+            if task is not None:
+                self.loop.call_soon_threadsafe(task.cancel)
+
+        if token is not None:
+            token.on_cancel(abort)
+        try:
+            while token is None or not token.cancelled:
+                item = self._call(step())
+                if item is done:
+                    return
+                yield item
+        finally:
+            # Also runs when the caller stops early, so the engine releases its upstream call
+            self._call(events.aclose())
+
+def create_transport(name: str, serve_http: bool = False, base_url: str = None,
+                     connect_timeout: float = 5, read_timeout: float = 30):
+    """Build the transport selected by CLIPPY_TRANSPORT"""
+    if name == "inprocess":
+        return InProcessTransport(serve_http=serve_http)
+    if name == "http":
+        return HttpTransport(base_url or f"http://{SERVER_HOST}:{SERVER_PORT}", connect_timeout, read_timeout)
+    raise ValueError(f"Unknown transport: {name}")
@@ -2,13 +2,14 @@ from PyQt5.QtWidgets import QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayo
 from PyQt5.QtCore import Qt
 
 class PromptWindow(QWidget):
-    def __init__(self, on_yes, on_no):
+    def __init__(self, on_yes, on_no, on_reopen=None):
         super().__init__()
         self.setWindowTitle("Confirm")
-        self.setFixedSize(300, 100)
+        self.setFixedSize(360 if on_reopen else 300, 100)
         self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
 
-        label = QLabel("Explain with ClippyAI?")
+        # on_reopen is given when this text was analyzed recently
+        label = QLabel("Analyzed this before. Explain again?" if on_reopen else "Explain with ClippyAI?")
         label.setStyleSheet("font-size: 14px;")
 
         yes_button = QPushButton("Yes")
@@ -19,8 +20,13 @@ class PromptWindow(QWidget):
 
         self.on_yes = on_yes
         self.on_no = on_no
+        self.on_reopen = on_reopen
 
         button_layout = QHBoxLayout()
+        if on_reopen:
+            reopen_button = QPushButton("↩️ Reopen previous")
+            reopen_button.clicked.connect(self.handle_reopen)
+            button_layout.addWidget(reopen_button)
         button_layout.addWidget(yes_button)
         button_layout.addWidget(no_button)
 
@@ -37,6 +43,10 @@ class PromptWindow(QWidget):
         self.close()
         self.on_no()
 
+    def handle_reopen(self):
+        self.close()
+        self.on_reopen()
+
 # ✅ New Additional Info Prompt Window
 class AdditionalInfoPromptWindow(QWidget):
     def __init__(self, on_proceed):
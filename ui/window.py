@@ -6,7 +6,7 @@ from PyQt5.QtWidgets import (
     QPushButton, QHBoxLayout, QTextEdit, QSizeGrip, QSplitter, QLineEdit
 )
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtGui import QIcon, QPixmap, QTextCursor
 from api_key_manager import APIKeyDialog
 from chat_history import ConversationManager
 import resources_rc  # Import the compiled resource file
@@ -17,6 +17,7 @@ class FloatingWindow(QWidget):
 
         self.current_theme = "dark"  # Default theme
         self.conversation_manager = ConversationManager()
+        self.chat_stream_start = None  # Cursor position of the message being streamed
 
         self.setWindowTitle("ClippyAI - Code Analyzer")
         self.setWindowFlags(
@@ -75,6 +76,11 @@ class FloatingWindow(QWidget):
         title = QLabel("ClippyAI")
         title.setStyleSheet("font-size: 16px; font-weight: bold; margin-left: 8px;")
         title_bar.addWidget(title)
+
+        # Progress of requests in flight (set by main.py)
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("font-size: 12px; color: #888; margin-left: 12px;")
+        title_bar.addWidget(self.status_label)
         title_bar.addStretch()
 
         self.theme_btn = QPushButton("☀️ Light Mode")
@@ -196,19 +202,21 @@ class FloatingWindow(QWidget):
         if not user_message:
             return
 
-        # Add to chat history display
-        self.add_chat_message("You", user_message, "#4CAF50")
         self.chat_input.clear()
 
-        # Add to conversation manager
-        self.conversation_manager.add_message("user", user_message)
-
-        # Send to AI for response (this will be called from main.py)
+        # Send to AI for response (this will be called from main.py). It shows the message and
+        # adds it to the conversation when its turn comes, as messages queue while a reply streams.
         if hasattr(self, 'get_chat_response_callback'):
-            self.get_chat_response_callback()
+            self.get_chat_response_callback(user_message)
 
-    def add_chat_message(self, sender: str, message: str, color: str):
-        """Add a message to the chat history display"""
+    def closeEvent(self, event):
+        """Let main.py abort requests in flight; their results would have nowhere to go"""
+        if hasattr(self, 'window_closed_callback'):
+            self.window_closed_callback()
+        super().closeEvent(event)
+
+    def format_chat_message(self, sender: str, message: str, color: str):
+        """Render one chat message as themed HTML"""
         timestamp = datetime.now().strftime("%H:%M")
         
         # Apply theme-appropriate styling
@@ -222,7 +230,7 @@ class FloatingWindow(QWidget):
             time_color = "#666"
 
         # Use .format() method instead of f-string to avoid backslash issues
-        formatted_message = """
+        return """
         <div style="margin: 8px 0; padding: 10px; background-color: {bg_color}; border-left: 3px solid {color}; border-radius: 5px;">
             <div style="margin-bottom: 5px;">
                 <strong style="color: {color};">{sender}</strong> 
@@ -241,9 +249,35 @@ class FloatingWindow(QWidget):
             text_color=text_color,
             message=message.replace('\n', '<br>')
         )
-        
-        self.chat_history.append(formatted_message)
-        
+
+    def add_chat_message(self, sender: str, message: str, color: str):
+        """Add a message to the chat history display"""
+        self.chat_history.append(self.format_chat_message(sender, message, color))
+        self.scroll_chat_to_bottom()
+
+    def begin_chat_stream(self):
+        """Remember where a streamed message starts so it can be redrawn in place"""
+        cursor = self.chat_history.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        self.chat_stream_start = cursor.position()
+
+    def update_chat_stream(self, sender: str, message: str, color: str):
+        """Replace the message being streamed with its latest content"""
+        if self.chat_stream_start is None:
+            self.begin_chat_stream()
+        cursor = self.chat_history.textCursor()
+        cursor.setPosition(self.chat_stream_start)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        self.add_chat_message(sender, message, color)
+
+    def end_chat_stream(self):
+        self.chat_stream_start = None
+
+    def set_status(self, text: str):
+        self.status_label.setText(text)
+
+    def scroll_chat_to_bottom(self):
         # Auto-scroll to bottom
         scrollbar = self.chat_history.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
@@ -0,0 +1,67 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+class CancelToken:
+    """Per-request cancellation flag shared by the GUI thread and a worker"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Call callback on cancel (right away if already cancelled), e.g. to abort a blocking read"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+class StreamSignals(QObject):
+    event = pyqtSignal(str, object)  # (event, data) from the transport
+    failed = pyqtSignal(object)  # Exception raised while opening or reading the stream
+    finished = pyqtSignal()  # Always emitted last, also after a failure or cancel
+
+class StreamWorker(QRunnable):
+    """Consumes a transport stream on a pool thread and forwards its events to the GUI thread"""
+
+    def __init__(self, open_stream, token: CancelToken = None):
+        super().__init__()
+        self.open_stream = open_stream  # Callable taking the token, returning an iterator of (event, data) pairs
+        self.token = token or CancelToken()
+        self.signals = StreamSignals()
+
+    def run(self):
+        events = None
+        try:
+            events = self.open_stream(self.token)
+            for event, data in events:
+                if self.token.cancelled:
+                    break
+                self.signals.event.emit(event, data)
+        except Exception as e:
+            if not self.token.cancelled:
+                self.signals.failed.emit(e)
+        finally:
+            # Closing the generator releases the HTTP response or engine stream right away
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+            self.signals.finished.emit()
+
+    def start(self):
+        QThreadPool.globalInstance().start(self)